@@ -12,6 +12,7 @@ from loguru import logger
 from app.config import config
 from app.models.exception import HttpException
 from app.router import root_api_router
+from app.services import cache_manager, clients, whisper
 from app.utils import utils
 
 
@@ -75,8 +76,15 @@ app.mount("/", StaticFiles(directory=public_dir, html=True), name="")
 @app.on_event("shutdown")
 def shutdown_event():
     logger.info("shutdown event")
+    clients.close_all()
+    whisper.parallel.shutdown()
+    cache_manager.manager.stop()
 
 
 @app.on_event("startup")
 def startup_event():
     logger.info("startup event")
+    cache_manager.manager.start()
+    if config.whisper.get("preload", False):
+        # load in the background, the api is usable while the model loads
+        utils.run_in_background(whisper.preload)
@@ -47,6 +47,7 @@ whisper = _cfg.get("whisper", {})
 proxy = _cfg.get("proxy", {})
 azure = _cfg.get("azure", {})
 siliconflow = _cfg.get("siliconflow", {})
+http = _cfg.get("http", {})
 ui = _cfg.get(
     "ui",
     {
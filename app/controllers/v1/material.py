@@ -0,0 +1,28 @@
+from fastapi import Request
+
+from app.controllers.v1.base import new_router
+from app.models.schema import MaterialCacheStatsResponse, MaterialKeyStatsResponse
+from app.services import cache_manager, key_scheduler
+from app.utils import utils
+
+# authentication dependency
+# router = new_router(dependencies=[Depends(base.verify_token)])
+router = new_router()
+
+
+@router.get(
+    "/material/cache",
+    response_model=MaterialCacheStatsResponse,
+    summary="Get the statistics of the material cache",
+)
+def get_material_cache_stats(request: Request):
+    return utils.get_response(200, cache_manager.manager.stats())
+
+
+@router.get(
+    "/material/keys",
+    response_model=MaterialKeyStatsResponse,
+    summary="Get the usage of the material provider api keys",
+)
+def get_material_key_stats(request: Request):
+    return utils.get_response(200, key_scheduler.metrics())
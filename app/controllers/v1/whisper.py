@@ -0,0 +1,19 @@
+from fastapi import Request
+
+from app.controllers.v1.base import new_router
+from app.models.schema import WhisperStatusResponse
+from app.services import whisper
+from app.utils import utils
+
+# authentication dependency
+# router = new_router(dependencies=[Depends(base.verify_token)])
+router = new_router()
+
+
+@router.get(
+    "/whisper/status",
+    response_model=WhisperStatusResponse,
+    summary="Get the status of the whisper model pool",
+)
+def get_whisper_status(request: Request):
+    return utils.get_response(200, whisper.manager.status())
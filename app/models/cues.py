@@ -0,0 +1,116 @@
+"""
+Compact subtitle cues shared by the pipeline stages.
+
+The cues are built once (from TTS word boundaries, audio alignment or a
+Whisper transcript) and handed from stage to stage in memory. SRT / VTT are
+only serialized as output artifacts.
+"""
+
+import re
+from array import array
+from typing import Iterable, Iterator, Tuple
+
+_SRT_CUE_RE = re.compile(
+    r"(\d+):(\d+):(\d+)[,.](\d+)\s*-->\s*(\d+):(\d+):(\d+)[,.](\d+)[^\n]*\n(.*?)(?:\n[ \t]*\n|\Z)",
+    re.S,
+)
+
+
+def _format_time(ms: int, separator: str = ",") -> str:
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+
+class Cues:
+    """
+    Parallel arrays: start / end in milliseconds, and the end offset of every
+    cue's text in one joined string.
+    """
+
+    __slots__ = ("start_ms", "end_ms", "_text_ends", "_text")
+
+    def __init__(self):
+        self.start_ms = array("q")
+        self.end_ms = array("q")
+        self._text_ends = array("q")
+        self._text = ""
+
+    @classmethod
+    def from_items(cls, items: Iterable[Tuple[float, float, str]]) -> "Cues":
+        """
+        Build from (start_seconds, end_seconds, text) items
+        """
+        cues = cls()
+        texts = []
+        end = 0
+        for start_time, end_time, text in items:
+            text = text.strip()
+            cues.start_ms.append(int(round(start_time * 1000)))
+            cues.end_ms.append(int(round(end_time * 1000)))
+            end += len(text)
+            cues._text_ends.append(end)
+            texts.append(text)
+        cues._text = "".join(texts)
+        return cues
+
+    @classmethod
+    def from_srt(cls, content: str) -> "Cues":
+        def ms(h, m, s, f):
+            return ((int(h) * 60 + int(m)) * 60 + int(s)) * 1000 + int(f.ljust(3, "0")[:3])
+
+        items = []
+        for g in _SRT_CUE_RE.findall(content.replace("\r\n", "\n")):
+            items.append((ms(*g[0:4]) / 1000, ms(*g[4:8]) / 1000, g[8]))
+        return cls.from_items(items)
+
+    @classmethod
+    def from_file(cls, subtitle_file: str) -> "Cues":
+        with open(subtitle_file, "r", encoding="utf-8") as f:
+            return cls.from_srt(f.read())
+
+    def __len__(self) -> int:
+        return len(self.start_ms)
+
+    def __bool__(self) -> bool:
+        return len(self.start_ms) > 0
+
+    def text(self, idx: int) -> str:
+        start = self._text_ends[idx - 1] if idx > 0 else 0
+        return self._text[start : self._text_ends[idx]]
+
+    def __iter__(self) -> Iterator[Tuple[float, float, str]]:
+        """
+        (start_seconds, end_seconds, text) per cue
+        """
+        for idx in range(len(self)):
+            yield self.start_ms[idx] / 1000, self.end_ms[idx] / 1000, self.text(idx)
+
+    @property
+    def duration(self) -> float:
+        return max(self.end_ms) / 1000 if self else 0.0
+
+    def to_srt(self) -> str:
+        lines = []
+        for idx in range(len(self)):
+            start = _format_time(self.start_ms[idx])
+            end = _format_time(self.end_ms[idx])
+            lines.append(f"{idx + 1}\n{start} --> {end}\n{self.text(idx)}\n")
+        return "\n".join(lines)
+
+    def to_vtt(self) -> str:
+        lines = ["WEBVTT\n"]
+        for idx in range(len(self)):
+            start = _format_time(self.start_ms[idx], ".")
+            end = _format_time(self.end_ms[idx], ".")
+            lines.append(f"{start} --> {end}\n{self.text(idx)}\n")
+        return "\n".join(lines)
+
+    def write(self, subtitle_file: str):
+        """
+        Serialize as SRT, or as WebVTT for a .vtt file
+        """
+        content = self.to_vtt() if subtitle_file.endswith(".vtt") else self.to_srt()
+        with open(subtitle_file, "w", encoding="utf-8") as f:
+            f.write(content)
@@ -42,6 +42,14 @@ class VideoAspect(str, Enum):
         return 1080, 1920
 
 
+class SubtitleMode(str, Enum):
+    # render the subtitles into the frames
+    burn = "burn"
+    # mux them as a text track (mov_text), plus .srt / .vtt sidecar files
+    soft = "soft"
+    both = "both"
+
+
 class _Config:
     arbitrary_types_allowed = True
 
@@ -51,6 +59,8 @@ class MaterialInfo:
     provider: str = "pexels"
     url: str = ""
     duration: int = 0
+    width: int = 0
+    height: int = 0
 
 
 class VideoParams(BaseModel):
@@ -92,6 +102,7 @@ class VideoParams(BaseModel):
     bgm_volume: Optional[float] = 0.2
 
     subtitle_enabled: Optional[bool] = True
+    subtitle_mode: Optional[SubtitleMode] = SubtitleMode.burn.value
     subtitle_position: Optional[str] = "bottom"  # top, bottom, center
     custom_position: float = 70.0
     font_name: Optional[str] = "STHeitiMedium.ttc"
@@ -301,3 +312,79 @@ class BgmUploadResponse(BaseResponse):
                 "data": {"file": "/MoneyPrinterTurbo/resource/songs/example.mp3"},
             },
         }
+
+
+class WhisperStatusResponse(BaseResponse):
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "status": 200,
+                "message": "success",
+                "data": {
+                    "model_size": "large-v3",
+                    "device": "cpu",
+                    "compute_type": "int8",
+                    "cpu_threads": 0,
+                    "num_workers": 1,
+                    "pool_size": 1,
+                    "loaded": 1,
+                    "in_use": 0,
+                    "idle": 1,
+                    "load_seconds": [21.37],
+                    "warmup_seconds": [1.82],
+                    "memory_bytes": [1654784000],
+                    "process_memory_bytes": 2103377920,
+                    "last_error": "",
+                },
+            },
+        }
+
+
+class MaterialCacheStatsResponse(BaseResponse):
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "status": 200,
+                "message": "success",
+                "data": {
+                    "directory": "/MoneyPrinterTurbo/storage/cache_videos",
+                    "policy": "lru",
+                    "budget_bytes": 21474836480,
+                    "size_bytes": 18253611008,
+                    "entries": 1342,
+                    "pinned": 12,
+                    "hits": 5210,
+                    "misses": 1830,
+                    "hit_ratio": 0.74,
+                    "evictions": 311,
+                    "evicted_bytes": 4194304000,
+                    "last_sweep": 1735689600.0,
+                },
+            },
+        }
+
+
+class MaterialKeyStatsResponse(BaseResponse):
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "status": 200,
+                "message": "success",
+                "data": {
+                    "pexels": [
+                        {
+                            "key": "...a1b2",
+                            "requests": 182,
+                            "throttled": 1,
+                            "tokens": 17.5,
+                            "remaining": 19810,
+                            "limit": 20000,
+                            "reset_at": 1735689600.0,
+                            "cooling_down": False,
+                            "last_used": 1735686000.0,
+                        }
+                    ],
+                    "pixabay": [],
+                },
+            },
+        }
@@ -9,9 +9,11 @@ Resources:
 
 from fastapi import APIRouter
 
-from app.controllers.v1 import llm, video
+from app.controllers.v1 import llm, material, video, whisper
 
 root_api_router = APIRouter()
 # v1
 root_api_router.include_router(video.router)
 root_api_router.include_router(llm.router)
+root_api_router.include_router(whisper.router)
+root_api_router.include_router(material.router)
@@ -0,0 +1,658 @@
+"""
+Script-to-audio alignment without a speech recognizer.
+
+When the script is known and the TTS provider gives no word boundaries, the
+sentence timings can be recovered from the narration itself: TTS engines put
+a pause after every sentence, so the short-time energy envelope of the audio
+shows where sentences start and end. The sentences are then mapped onto the
+detected pauses by their expected position (proportional to their length).
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from app.models.cues import Cues
+from app.utils import utils
+
+SAMPLE_RATE = 16000
+# kana, CJK ideographs, hangul and compatibility ideographs
+_CJK = "぀-ヿ㐀-䶿一-鿿가-힯豈-﫿"
+
+
+def load_audio(audio_file: str, sample_rate: int = SAMPLE_RATE) -> Optional[np.ndarray]:
+    """
+    Decode an audio file to mono float32 samples
+    """
+    try:
+        from faster_whisper.audio import decode_audio
+
+        return decode_audio(audio_file, sampling_rate=sample_rate)
+    except Exception as e:
+        logger.warning(f"failed to decode audio: {audio_file} => {str(e)}")
+        return None
+
+
+def energy_envelope(
+    samples: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    frame_ms: int = 25,
+    hop_ms: int = 10,
+) -> np.ndarray:
+    """
+    Short-time energy in dB, one value per hop
+    """
+    frame = max(1, sample_rate * frame_ms // 1000)
+    hop = max(1, sample_rate * hop_ms // 1000)
+    if len(samples) < frame:
+        samples = np.pad(samples, (0, frame - len(samples)))
+    windows = np.lib.stride_tricks.sliding_window_view(samples, frame)[::hop]
+    energy = np.mean(np.square(windows, dtype=np.float32), axis=1)
+    return 10.0 * np.log10(energy + 1e-10)
+
+
+def detect_silences(
+    envelope: np.ndarray,
+    hop_ms: int = 10,
+    min_silence_ms: int = 150,
+    threshold_ratio: float = 0.3,
+) -> List[Tuple[int, int]]:
+    """
+    Silent runs as (start_ms, end_ms), the threshold adapts to the recording:
+    it sits between the noise floor and the speech level.
+    """
+    if len(envelope) == 0:
+        return []
+    floor = np.percentile(envelope, 5)
+    speech = np.percentile(envelope, 95)
+    threshold = floor + (speech - floor) * threshold_ratio
+
+    silent = np.concatenate(([False], envelope < threshold, [False]))
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = (ends - starts) * hop_ms >= min_silence_ms
+    return [
+        (int(s) * hop_ms, int(e) * hop_ms) for s, e in zip(starts[keep], ends[keep])
+    ]
+
+
+def text_weight(text: str) -> int:
+    """
+    Rough speaking length of a sentence, in non-space characters
+    """
+    return max(1, sum(1 for c in text if not c.isspace()))
+
+
+def map_sentences(
+    weights: List[float],
+    speech_start: int,
+    speech_end: int,
+    pauses: List[Tuple[int, int]],
+    miss_penalty: float = 0.15,
+) -> List[Tuple[int, int]]:
+    """
+    Choose, for every sentence boundary, the pause closest to where the
+    boundary is expected if time were proportional to the sentence weights.
+
+    A dynamic programming pass keeps the choice monotonic; a boundary may also
+    be left without a pause (at `miss_penalty` cost, relative to the speech
+    span), in which case the expected position is used.
+    """
+    n = len(weights)
+    if n == 0:
+        return []
+    span = max(1, speech_end - speech_start)
+    if n == 1:
+        return [(speech_start, speech_end)]
+
+    cum = np.cumsum(np.asarray(weights, dtype=np.float64))
+    expected = speech_start + span * cum[:-1] / cum[-1]
+
+    pauses = [p for p in pauses if speech_start < p[0] and p[1] < speech_end]
+    p_count = len(pauses)
+    centers = np.array([(s + e) / 2 for s, e in pauses], dtype=np.float64)
+    lengths = np.array([e - s for s, e in pauses], dtype=np.float64)
+    # longer pauses are more likely to be sentence ends
+    bonus = 0.02 * np.log1p(lengths / 100.0) if p_count else lengths
+
+    # state k: last used pause is k - 1, k = 0 means none used yet
+    best = np.zeros(p_count + 1)
+    best[1:] = np.inf
+    choices = []
+    for i in range(n - 1):
+        cost = np.abs(centers - expected[i]) / span - bonus
+        prefix = np.minimum.accumulate(best)
+        prefix_arg = np.zeros(p_count + 1, dtype=np.int64)
+        for k in range(1, p_count + 1):
+            prefix_arg[k] = k if best[k] < prefix[k - 1] else prefix_arg[k - 1]
+        assign = np.full(p_count + 1, np.inf)
+        assign[1:] = prefix[:-1] + cost
+        skip = best + miss_penalty
+        take = assign < skip
+        new_best = np.where(take, assign, skip)
+        # previous state for backtracking
+        prev = np.where(take, np.concatenate(([0], prefix_arg[:-1])), np.arange(p_count + 1))
+        choices.append((take, prev))
+        best = new_best
+
+    state = int(np.argmin(best))
+    boundaries: List[Optional[Tuple[int, int]]] = [None] * (n - 1)
+    for i in range(n - 2, -1, -1):
+        take, prev = choices[i]
+        if take[state]:
+            boundaries[i] = pauses[state - 1]
+        state = int(prev[state])
+
+    timings = []
+    start = speech_start
+    for i in range(n):
+        if i < n - 1:
+            pause = boundaries[i]
+            if pause:
+                end, next_start = pause
+            else:
+                end = next_start = int(expected[i])
+        else:
+            end, next_start = speech_end, speech_end
+        end = max(end, start)
+        timings.append((int(start), int(end)))
+        start = max(next_start, end)
+    return timings
+
+
+def align_sentences(
+    audio_file: str, sentences: List[str]
+) -> Optional[List[Tuple[int, int]]]:
+    """
+    Timings (start_ms, end_ms) for every sentence of the narration, or None
+    if the audio can not be analysed.
+    """
+    if not sentences:
+        return None
+    samples = load_audio(audio_file)
+    if samples is None or len(samples) == 0:
+        return None
+
+    hop_ms = 10
+    envelope = energy_envelope(samples, SAMPLE_RATE, hop_ms=hop_ms)
+    silences = detect_silences(envelope, hop_ms=hop_ms)
+    total_ms = len(envelope) * hop_ms
+
+    speech_start, speech_end = 0, total_ms
+    if silences and silences[0][0] == 0:
+        speech_start = silences[0][1]
+    if silences and silences[-1][1] >= total_ms:
+        speech_end = silences[-1][0]
+    if speech_end <= speech_start:
+        return None
+
+    weights = [text_weight(s) for s in sentences]
+    timings = map_sentences(weights, speech_start, speech_end, silences)
+    logger.debug(
+        f"aligned {len(sentences)} sentences over {len(silences)} pauses, speech: {speech_start}-{speech_end}ms"
+    )
+    return timings
+
+
+_SYLLABLE_RE = re.compile(rf"[{_CJK}]|[aeiouyà-ÿ]+|\d", re.I)
+
+
+def syllable_weight(text: str) -> int:
+    """
+    Approximate syllable count: one per CJK character / Hangul block, one per
+    vowel group in alphabetic words, one per digit
+    """
+    count = 0
+    for word in text.split():
+        count += max(1, len(_SYLLABLE_RE.findall(word)))
+    return max(1, count)
+
+
+def align_sentences_vad(
+    audio_file: str, sentences: List[str], min_silence_ms: int = 200
+) -> Optional[List[Tuple[int, int]]]:
+    """
+    Timings (start_ms, end_ms) for every sentence from the speech regions found
+    by the Silero VAD bundled with faster-whisper; the decoder is never run.
+    Sentences are distributed over the regions by syllable weight.
+    """
+    if not sentences:
+        return None
+    samples = load_audio(audio_file)
+    if samples is None or len(samples) == 0:
+        return None
+
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    regions = get_speech_timestamps(
+        samples, VadOptions(min_silence_duration_ms=min_silence_ms, speech_pad_ms=0)
+    )
+    if not regions:
+        return None
+
+    to_ms = 1000 / SAMPLE_RATE
+    speech_start = int(regions[0]["start"] * to_ms)
+    speech_end = int(regions[-1]["end"] * to_ms)
+    pauses = [
+        (int(prev["end"] * to_ms), int(cur["start"] * to_ms))
+        for prev, cur in zip(regions, regions[1:])
+    ]
+    weights = [syllable_weight(s) for s in sentences]
+    timings = map_sentences(weights, speech_start, speech_end, pauses)
+    logger.debug(
+        f"aligned {len(sentences)} sentences over {len(regions)} speech regions"
+    )
+    return timings
+
+
+def create_subtitle(
+    audio_file: str, text: str, subtitle_file: str, method: str = "energy"
+) -> Optional[Cues]:
+    """
+    Cues for the script by aligning its sentences to the narration, also
+    written to subtitle_file. `method` is "energy" (pauses in the energy
+    envelope) or "vad" (speech regions of the Silero VAD).
+    """
+    sentences = utils.split_string_by_punctuations(text)
+    if method == "vad":
+        timings = align_sentences_vad(audio_file, sentences)
+    else:
+        timings = align_sentences(audio_file, sentences)
+    if not timings:
+        return None
+
+    cues = Cues.from_items(
+        (start / 1000, end / 1000, sentence)
+        for sentence, (start, end) in zip(sentences, timings)
+    )
+    cues.write(subtitle_file)
+    logger.info(f"subtitle file created by alignment: {subtitle_file}")
+    return cues
+
+
+_NON_WORD_RE = re.compile(r"\W+")
+
+
+def normalize(text: str) -> str:
+    """
+    Case-folded word characters only, the form script and TTS tokens are compared in
+    """
+    return _NON_WORD_RE.sub("", text).casefold()
+
+
+def align_word_boundaries(
+    offsets: List[Tuple[int, int]],
+    words: List[str],
+    script_lines: List[str],
+    max_skip: int = 32,
+    error_ratio: float = 0.3,
+) -> Optional[List[Tuple[int, int, str]]]:
+    """
+    Stream the TTS word boundaries over the script in a single pass.
+
+    The script is normalized once into one character stream with the end
+    position of every line. Each word advances a cursor through that stream;
+    a word that does not match at the cursor is searched for within
+    `max_skip` characters ahead (script text that was not spoken), otherwise it
+    is ignored (spoken text that is not in the script). Both kinds of edits are
+    charged to a budget of `error_ratio` of the script length, beyond which the
+    alignment is abandoned.
+
+    Returns (start, end, line) per script line, in the units of `offsets`.
+    """
+    lines = [line.strip() for line in script_lines]
+    line_ends = []
+    stream = []
+    pos = 0
+    for line in lines:
+        n = normalize(line)
+        stream.append(n)
+        pos += len(n)
+        line_ends.append(pos)
+    stream = "".join(stream)
+    if not lines:
+        return None
+
+    budget = max(16, int(len(stream) * error_ratio))
+    errors = 0
+    cursor = 0
+    line_idx = 0
+    line_start = None
+    last_end = 0
+    cues = []
+
+    def close_lines(until: int, t_start: int, t_end: int, tok_from: int, tok_len: int):
+        # emit every line that ends at or before `until`, a line ending inside
+        # a word gets a time interpolated by character position
+        nonlocal line_idx, line_start
+        while line_idx < len(lines) and line_ends[line_idx] <= until:
+            if tok_len:
+                ratio = (line_ends[line_idx] - tok_from) / tok_len
+                end = int(t_start + (t_end - t_start) * min(1.0, max(0.0, ratio)))
+            else:
+                end = t_end
+            start = line_start if line_start is not None else end
+            cues.append((start, max(start, end), lines[line_idx]))
+            # the next line starts inside the same word
+            line_start = end if tok_len and line_ends[line_idx] < until else None
+            line_idx += 1
+
+    for (t_start, t_end), word in zip(offsets, words):
+        token = normalize(word)
+        if not token:
+            continue
+
+        if stream.startswith(token, cursor):
+            pos = cursor
+        else:
+            pos = stream.find(token, cursor, cursor + max_skip + len(token))
+            if pos < 0:
+                errors += len(token)
+                if errors > budget:
+                    return None
+                continue
+            errors += pos - cursor
+            if errors > budget:
+                return None
+            # skipped script text belongs to the previous word
+            close_lines(pos, last_end, last_end, pos, 0)
+
+        if line_start is None:
+            line_start = t_start
+        cursor = pos + len(token)
+        close_lines(cursor, t_start, t_end, pos, len(token))
+        last_end = t_end
+
+    if line_idx < len(lines):
+        errors += len(stream) - cursor
+        if errors > budget:
+            return None
+        close_lines(len(stream), last_end, last_end, len(stream), 0)
+    return cues
+
+
+_TOKEN_RE = re.compile(f"[{_CJK}]|[^{_CJK}]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Normalized tokens: words for space separated scripts, single characters
+    for CJK text (which has no word separators)
+    """
+    tokens = []
+    for part in text.split():
+        tokens.extend(_TOKEN_RE.findall(normalize(part)))
+    return tokens
+
+
+def _banded_alignment(a: List[int], b: List[int], band: int) -> List[Tuple[int, int]]:
+    """
+    Global alignment (unit cost Levenshtein over tokens) of `a` against `b`,
+    restricted to a diagonal band. Returns the matched / substituted pairs
+    (i, j) in order.
+
+    Every row is computed with NumPy over the band only; the insertion chain is
+    a running minimum of (cost - column), so the pass is O(len(a) * band).
+    """
+    n, m = len(a), len(b)
+    b = np.asarray(b, dtype=np.int64)
+    width = max(band, abs(n - m) + band // 2)
+    inf = np.iinfo(np.int64).max // 4
+
+    los = [0]
+    rows = [np.arange(min(m, width) + 1, dtype=np.int64)]
+    for i in range(1, n + 1):
+        center = i * m // n
+        lo, hi = max(0, center - width), min(m, center + width) + 1
+        prev, prev_lo = rows[-1], los[-1]
+        prev_hi = prev_lo + len(prev)
+        cols = np.arange(lo, hi)
+
+        up = np.full(hi - lo, inf, dtype=np.int64)
+        mask = (cols >= prev_lo) & (cols < prev_hi)
+        up[mask] = prev[cols[mask] - prev_lo]
+        diag = np.full(hi - lo, inf, dtype=np.int64)
+        mask = (cols - 1 >= prev_lo) & (cols - 1 < prev_hi)
+        diag[mask] = prev[cols[mask] - 1 - prev_lo] + (b[cols[mask] - 1] != a[i - 1])
+
+        candidates = np.minimum(up + 1, diag)
+        if lo == 0:
+            candidates[0] = i
+        offsets = np.arange(hi - lo, dtype=np.int64)
+        rows.append(np.minimum.accumulate(candidates - offsets) + offsets)
+        los.append(lo)
+
+    def value(i, j):
+        k = j - los[i]
+        return rows[i][k] if 0 <= k < len(rows[i]) else inf
+
+    pairs = []
+    i, j = n, m
+    while i > 0 and j > 0:
+        current = value(i, j)
+        if value(i - 1, j - 1) + (a[i - 1] != b[j - 1]) == current:
+            pairs.append((i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif value(i - 1, j) + 1 == current:
+            i -= 1
+        else:
+            j -= 1
+    pairs.reverse()
+    return pairs
+
+
+def align_transcript(
+    script_lines: List[str],
+    words: List[Tuple[float, float, str]],
+    band: int = 64,
+) -> Optional[List[Tuple[float, float, str]]]:
+    """
+    Time every script line from recognized words (start, end, text).
+
+    Script tokens and transcript tokens are aligned in one global banded pass,
+    so a misrecognized or missing word only affects its own neighbourhood. A
+    line takes the times of its aligned tokens; lines without any aligned token
+    are placed between their neighbours by text length. Timings are monotonic
+    and every line gets a cue.
+
+    Returns (start, end, line) per script line, or None if nothing aligns.
+    """
+    lines = [line.strip() for line in script_lines if line.strip()]
+    if not lines or not words:
+        return None
+
+    vocabulary = {}
+    script_ids, token_line = [], []
+    for idx, line in enumerate(lines):
+        for token in tokenize(line):
+            script_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+            token_line.append(idx)
+
+    word_ids, word_times = [], []
+    for start, end, text in words:
+        tokens = tokenize(text)
+        # a word holding several tokens (CJK) is split evenly over its duration
+        step = (end - start) / max(1, len(tokens))
+        for k, token in enumerate(tokens):
+            word_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+            word_times.append((start + k * step, start + (k + 1) * step))
+    if not script_ids or not word_ids:
+        return None
+
+    pairs = _banded_alignment(script_ids, word_ids, band)
+    if not pairs:
+        return None
+
+    starts = [None] * len(lines)
+    ends = [None] * len(lines)
+    for i, j in pairs:
+        idx = token_line[i]
+        t_start, t_end = word_times[j]
+        if starts[idx] is None:
+            starts[idx] = t_start
+        ends[idx] = t_end
+
+    total = max(end for _, end, _ in words)
+    cues = []
+    prev_end = 0.0
+    idx = 0
+    while idx < len(lines):
+        if starts[idx] is not None:
+            start = max(starts[idx], prev_end)
+            end = max(ends[idx], start)
+            cues.append((start, end, lines[idx]))
+            prev_end = end
+            idx += 1
+            continue
+
+        # a run of lines without aligned tokens shares the gap to the next
+        # aligned line in proportion to their length
+        run_end = idx
+        while run_end < len(lines) and starts[run_end] is None:
+            run_end += 1
+        gap_end = starts[run_end] if run_end < len(lines) else total
+        gap_end = max(gap_end, prev_end)
+        weights = [text_weight(line) for line in lines[idx:run_end]]
+        span = gap_end - prev_end
+        t = prev_end
+        for line, weight in zip(lines[idx:run_end], weights):
+            end = t + span * weight / sum(weights)
+            cues.append((t, end, line))
+            t = end
+        prev_end = gap_end
+        idx = run_end
+
+    logger.debug(
+        f"aligned {len(script_ids)} script tokens to {len(word_ids)} transcript tokens, "
+        f"{len(pairs)} pairs"
+    )
+    return cues
+
+
+def _levenshtein_reference(s1: str, s2: str) -> int:
+    if len(s1) < len(s2):
+        return _levenshtein_reference(s2, s1)
+    if len(s2) == 0:
+        return len(s1)
+
+    previous_row = range(len(s2) + 1)
+    for i, c1 in enumerate(s1):
+        current_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            insertions = previous_row[j + 1] + 1
+            deletions = current_row[j] + 1
+            substitutions = previous_row[j] + (c1 != c2)
+            current_row.append(min(insertions, deletions, substitutions))
+        previous_row = current_row
+    return previous_row[-1]
+
+
+def _similarity_reference(a: str, b: str) -> float:
+    distance = _levenshtein_reference(a.lower(), b.lower())
+    return 1 - (distance / max(len(a), len(b)))
+
+
+def _greedy_merge_reference(
+    script_lines: List[str], subtitles: List[Tuple[float, float, str]]
+) -> List[Tuple[float, float, str]]:
+    """
+    The former line by line merge of subtitle.correct, kept for the benchmark:
+    recognized lines are appended to a script line while the character
+    similarity keeps growing
+    """
+    cues = []
+    script_index = 0
+    subtitle_index = 0
+    while script_index < len(script_lines) and subtitle_index < len(subtitles):
+        script_line = script_lines[script_index].strip()
+        start, end, combined = subtitles[subtitle_index]
+        combined = combined.strip()
+        next_index = subtitle_index + 1
+        if script_line != combined:
+            while next_index < len(subtitles):
+                candidate = combined + " " + subtitles[next_index][2].strip()
+                if _similarity_reference(script_line, candidate) > _similarity_reference(
+                    script_line, combined
+                ):
+                    combined = candidate
+                    end = subtitles[next_index][1]
+                    next_index += 1
+                else:
+                    break
+        cues.append((start, end, script_line))
+        script_index += 1
+        subtitle_index = next_index
+
+    while script_index < len(script_lines):
+        if subtitle_index < len(subtitles):
+            start, end, _ = subtitles[subtitle_index]
+            subtitle_index += 1
+        else:
+            start = end = 0.0
+        cues.append((start, end, script_lines[script_index]))
+        script_index += 1
+    return cues
+
+
+def benchmark(minutes: float = 3, error_rate: float = 0.05, repeat: int = 3):
+    """
+    align_transcript against the former greedy merge on a synthetic narration
+    of `minutes` (150 words a minute), recognized with `error_rate` of the
+    words wrong and cut into lines that do not follow the script's sentences
+    """
+    import random
+    from timeit import default_timer as timer
+
+    rng = random.Random(42)
+    vocabulary = (
+        "money time people market video story world value growth future simple "
+        "every saving habit income budget invest daily plan learn small steps"
+    ).split()
+    words = [rng.choice(vocabulary) for _ in range(int(minutes * 150))]
+
+    script_lines, truth = [], []
+    recognized = []
+    t = 0.0
+    idx = 0
+    while idx < len(words):
+        sentence = words[idx : idx + rng.randint(6, 14)]
+        script_lines.append(" ".join(sentence))
+        truth.append(t)
+        for word in sentence:
+            if rng.random() < error_rate:
+                word = rng.choice(vocabulary)[::-1]
+            recognized.append((t, t + 0.35, word))
+            t += 0.4
+        t += 0.3
+        idx += len(sentence)
+
+    subtitles = []
+    idx = 0
+    while idx < len(recognized):
+        chunk = recognized[idx : idx + rng.randint(4, 12)]
+        subtitles.append((chunk[0][0], chunk[-1][1], " ".join(w for _, _, w in chunk)))
+        idx += len(chunk)
+
+    results = {}
+    for name, fn, data in (
+        ("alignment", align_transcript, recognized),
+        ("reference", _greedy_merge_reference, subtitles),
+    ):
+        start = timer()
+        for _ in range(repeat):
+            cues = fn(script_lines, data)
+        elapsed = (timer() - start) / repeat
+        error = sum(abs(c[0] - s) for c, s in zip(cues, truth)) / len(truth)
+        results[name] = (elapsed, error)
+        logger.info(
+            f"{name}: {elapsed * 1000:.2f} ms for {len(script_lines)} lines / {len(words)} words, "
+            f"mean start error: {error:.2f} s"
+        )
+    logger.info(f"speedup: {results['reference'][0] / results['alignment'][0]:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
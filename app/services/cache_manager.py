@@ -0,0 +1,240 @@
+"""
+Size budget for the material cache directory.
+
+Downloaded clips are kept for reuse, but the directory must not grow until
+the disk is full. A background sweeper evicts clips once the directory is
+over `material_cache_budget_mb`, least recently used first ("lru") or least
+used first ("lfu"). Clips pinned by running tasks, and clips accessed during
+the grace period, are never evicted.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple
+
+from loguru import logger
+
+from app.config import config
+from app.services import material_library
+from app.utils import utils
+
+# only the clips saved by the downloader, the material directory may also
+# hold the user's own videos: vid-<md5>.mp4, vid-<md5>-<seconds>s.mp4 and the
+# .part / .src.part files of their downloads
+_CLIP_NAME = re.compile(r"^vid-[0-9a-f]{32}(-\d+s)?\.mp4((\.src)?\.part)?$")
+# leftovers of interrupted downloads are kept this long for resuming
+_PART_FILE_TTL = 24 * 3600
+
+
+class _Entry(NamedTuple):
+    path: str
+    size: int
+    last_access: float
+    uses: int
+    partial: bool
+
+
+class CacheManager:
+    def __init__(
+        self,
+        directory: str,
+        budget_bytes: int,
+        policy: str = "lru",
+        interval: int = 600,
+        grace_seconds: int = 3600,
+    ):
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self.policy = policy if policy in ("lru", "lfu") else "lru"
+        self.interval = max(10, interval)
+        self.grace_seconds = grace_seconds
+
+        self._lock = threading.Lock()
+        self._pins = Counter()
+        self._task_pins: Dict[str, List[str]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._evicted_bytes = 0
+        self._last_sweep = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def touch(self, path: str, hit: bool = True):
+        """
+        Record an access: the file's atime is the last-access time of the clip
+        """
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+        try:
+            st = os.stat(path)
+            os.utime(path, (time.time(), st.st_mtime))
+        except OSError:
+            pass
+
+    def pin(self, paths: Iterable[str], task_id: str = ""):
+        """
+        Protect clips from eviction, pins of a task are released together by
+        unpin_task
+        """
+        with self._lock:
+            for path in paths:
+                key = os.path.realpath(path)
+                self._pins[key] += 1
+                if task_id:
+                    self._task_pins.setdefault(task_id, []).append(key)
+
+    def unpin(self, paths: Iterable[str]):
+        with self._lock:
+            for path in paths:
+                key = os.path.realpath(path)
+                self._pins[key] -= 1
+                if self._pins[key] <= 0:
+                    del self._pins[key]
+
+    def unpin_task(self, task_id: str):
+        with self._lock:
+            paths = self._task_pins.pop(task_id, [])
+        self.unpin(paths)
+
+    def _entries(self) -> List[_Entry]:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+
+        now = time.time()
+        entries = []
+        clips = []
+        for name in names:
+            if not _CLIP_NAME.match(name):
+                continue
+            path = os.path.realpath(os.path.join(self.directory, name))
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if name.endswith(".part"):
+                if now - st.st_mtime > _PART_FILE_TTL:
+                    entries.append(_Entry(path, st.st_size, st.st_mtime, 0, True))
+            else:
+                clips.append((path, st.st_size, max(st.st_atime, st.st_mtime)))
+
+        # the library knows when a clip was last used by a task, and how often
+        usage = material_library.library.usage([c[0] for c in clips])
+        for path, size, last_access in clips:
+            uses, last_used = usage.get(path, (0, 0.0))
+            entries.append(_Entry(path, size, max(last_access, last_used), uses, False))
+        return entries
+
+    def sweep(self) -> int:
+        """
+        Evict clips until the directory fits the budget, returns the bytes freed
+        """
+        entries = self._entries()
+        now = time.time()
+        total = sum(e.size for e in entries)
+        freed = 0
+
+        # stale partial downloads go first, whatever the budget
+        candidates = [e for e in entries if e.partial]
+        if self.budget_bytes > 0 and total > self.budget_bytes:
+            clips = [e for e in entries if not e.partial]
+            if self.policy == "lfu":
+                clips.sort(key=lambda e: (e.uses, e.last_access))
+            else:
+                clips.sort(key=lambda e: e.last_access)
+            candidates += clips
+
+        for e in candidates:
+            if not e.partial and total - freed <= self.budget_bytes:
+                break
+            with self._lock:
+                if self._pins.get(e.path):
+                    continue
+            if not e.partial and now - e.last_access < self.grace_seconds:
+                continue
+            try:
+                os.remove(e.path)
+            except OSError as ex:
+                logger.warning(f"failed to evict: {e.path} => {str(ex)}")
+                continue
+            if not e.partial:
+                material_library.library.remove(e.path)
+            freed += e.size
+            with self._lock:
+                self._evictions += 1
+                self._evicted_bytes += e.size
+
+        with self._lock:
+            self._last_sweep = now
+        if freed:
+            logger.info(
+                f"material cache sweep: freed {freed} bytes, size: {total - freed} / {self.budget_bytes} bytes"
+            )
+        return freed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"material cache sweep failed: {str(e)}")
+
+    def start(self):
+        if self.budget_bytes <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="material-cache-sweeper", daemon=True
+            )
+            self._thread.start()
+        logger.info(
+            f"material cache sweeper started: {self.directory}, budget: {self.budget_bytes} bytes, policy: {self.policy}"
+        )
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "directory": self.directory,
+                "policy": self.policy,
+                "budget_bytes": self.budget_bytes,
+                "size_bytes": sum(e.size for e in entries),
+                "entries": sum(1 for e in entries if not e.partial),
+                "pinned": len(self._pins),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "evicted_bytes": self._evicted_bytes,
+                "last_sweep": self._last_sweep,
+            }
+
+
+def _cache_directory() -> str:
+    material_directory = config.app.get("material_directory", "").strip()
+    if material_directory and material_directory != "task" and os.path.isdir(material_directory):
+        return material_directory
+    return utils.storage_dir("cache_videos")
+
+
+manager = CacheManager(
+    directory=_cache_directory(),
+    budget_bytes=int(config.app.get("material_cache_budget_mb", 0)) * 1024 * 1024,
+    policy=config.app.get("material_cache_policy", "lru"),
+    interval=int(config.app.get("material_cache_sweep_interval", 600)),
+)
@@ -0,0 +1,120 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from app.config import config
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_sdk_clients: Dict[Tuple, object] = {}
+
+
+def timeout(connect: float = None, read: float = None) -> Tuple[float, float]:
+    """
+    (connect, read) timeout tuple, falling back to the [http] config section
+    """
+    if connect is None:
+        connect = config.http.get("connect_timeout", 30)
+    if read is None:
+        read = config.http.get("read_timeout", 120)
+    return connect, read
+
+
+def llm_timeout() -> Optional[float]:
+    """
+    Timeout of LLM requests, None unless `llm_timeout` is set: generations of
+    slow local models take minutes, the SDK default is 600 s
+    """
+    value = config.http.get("llm_timeout")
+    return float(value) if value else None
+
+
+def session(name: str = "default") -> requests.Session:
+    """
+    Returns a shared keep-alive session, one per service name.
+
+    Each session keeps a connection pool per host, so repeated calls to the
+    same API (pexels, pixabay, siliconflow ...) reuse TCP/TLS connections
+    instead of handshaking on every request.
+    """
+    s = _sessions.get(name)
+    if s is not None:
+        return s
+
+    with _lock:
+        s = _sessions.get(name)
+        if s is None:
+            pool_connections = int(config.http.get("pool_connections", 10))
+            pool_maxsize = int(config.http.get("pool_maxsize", 20))
+            max_retries = int(config.http.get("max_retries", 0))
+            adapter = HTTPAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                max_retries=max_retries,
+            )
+            s = requests.Session()
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _sessions[name] = s
+            logger.debug(
+                f"http session created: {name}, pool_connections: {pool_connections}, pool_maxsize: {pool_maxsize}"
+            )
+    return s
+
+
+def openai_client(provider: str, api_key: str, base_url: str, api_version: str = ""):
+    """
+    Returns a cached OpenAI / AzureOpenAI client keyed by (provider, base_url, api_key).
+
+    The SDK client owns an httpx connection pool, constructing it per request
+    throws the pool away together with its warm connections.
+    """
+    key = (provider, base_url, api_key, api_version)
+    client = _sdk_clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _sdk_clients.get(key)
+        if client is None:
+            from openai import AzureOpenAI, OpenAI
+
+            # the SDK keeps its own default unless a timeout is configured
+            kwargs = {}
+            if llm_timeout():
+                kwargs["timeout"] = llm_timeout()
+            if provider == "azure":
+                client = AzureOpenAI(
+                    api_key=api_key,
+                    api_version=api_version,
+                    azure_endpoint=base_url,
+                    **kwargs,
+                )
+            else:
+                client = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    **kwargs,
+                )
+            _sdk_clients[key] = client
+            logger.debug(f"sdk client created: {provider}, base_url: {base_url}")
+    return client
+
+
+def close_all():
+    with _lock:
+        for s in _sessions.values():
+            try:
+                s.close()
+            except Exception:
+                pass
+        _sessions.clear()
+        for c in _sdk_clients.values():
+            try:
+                c.close()
+            except Exception:
+                pass
+        _sdk_clients.clear()
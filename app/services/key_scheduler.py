@@ -0,0 +1,210 @@
+"""
+API keys of the material providers.
+
+Keys are picked by a scheduler instead of plain round robin. Every key has a
+token bucket refilled at the provider's documented request rate, the
+rate-limit headers of the responses keep the remaining quota of the key in
+sync with the provider, and a key answered with 429 rests until its quota
+resets. Selection is thread-safe, tasks share the schedulers.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from app.config import config
+from app.utils import utils
+
+# (requests, window in seconds) of the free API plans
+_RATE_LIMITS = {
+    "pexels": (200, 3600),
+    "pixabay": (100, 60),
+}
+# cooldown after a 429 that does not say when the quota resets
+_DEFAULT_COOLDOWN = 60
+# the longest a request waits for a key before using the least bad one
+_MAX_WAIT = 10
+
+
+class _KeyState:
+    __slots__ = (
+        "tokens",
+        "refilled_at",
+        "remaining",
+        "limit",
+        "reset_at",
+        "cooldown_until",
+        "requests",
+        "throttled",
+        "last_used",
+    )
+
+    def __init__(self, capacity: float):
+        self.tokens = capacity
+        self.refilled_at = time.monotonic()
+        self.remaining: Optional[int] = None
+        self.limit: Optional[int] = None
+        self.reset_at = 0.0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.last_used = 0.0
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class KeyScheduler:
+    def __init__(self, provider: str, requests_per_window: int, window: int):
+        self.provider = provider
+        self.cfg_key = f"{provider}_api_keys"
+        self.capacity = float(requests_per_window)
+        self.rate = requests_per_window / window
+        self._lock = threading.Lock()
+        self._states: Dict[str, _KeyState] = {}
+
+    def keys(self) -> List[str]:
+        # read on every call, the keys can be edited in the web ui
+        api_keys = config.app.get(self.cfg_key) or []
+        if isinstance(api_keys, str):
+            api_keys = [api_keys]
+        # the web ui saves an input like "," as blank keys
+        api_keys = [k.strip() for k in api_keys if k and k.strip()]
+        if not api_keys:
+            raise ValueError(
+                f"\n\n##### {self.cfg_key} is not set #####\n\nPlease set it in the config.toml file: {config.config_file}\n\n"
+                f"{utils.to_json(config.app)}"
+            )
+        return api_keys
+
+    def _state(self, key: str) -> _KeyState:
+        state = self._states.get(key)
+        if state is None:
+            state = _KeyState(self.capacity)
+            self._states[key] = state
+        return state
+
+    def _refill(self, state: _KeyState, now: float):
+        state.tokens = min(self.capacity, state.tokens + (now - state.refilled_at) * self.rate)
+        state.refilled_at = now
+
+    def _wait_seconds(self, state: _KeyState, wall: float) -> float:
+        """
+        Seconds until the key can be used
+        """
+        wait = max(0.0, state.cooldown_until - wall)
+        if state.remaining == 0 and state.reset_at > wall:
+            wait = max(wait, state.reset_at - wall)
+        if state.tokens < 1:
+            wait = max(wait, (1 - state.tokens) / self.rate)
+        return wait
+
+    def acquire(self, max_wait: float = _MAX_WAIT) -> str:
+        """
+        The key with the most quota left. When all keys are exhausted, waits
+        for the first one to free up if that happens within max_wait seconds,
+        otherwise uses it right away and the request fails like it would have
+        without the scheduler.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            keys = self.keys()
+            with self._lock:
+                now = time.monotonic()
+                wall = time.time()
+                best = None
+                for key in keys:
+                    state = self._state(key)
+                    self._refill(state, now)
+                    wait = self._wait_seconds(state, wall)
+                    quota = state.tokens
+                    if state.remaining is not None:
+                        quota = min(quota, state.remaining)
+                    # available first, then the most quota, then least recently used
+                    rank = (wait, -quota, state.last_used)
+                    if best is None or rank < best[0]:
+                        best = (rank, key, state)
+                wait = best[0][0]
+                if wait <= 0 or now + wait > deadline:
+                    state = best[2]
+                    state.tokens = max(0.0, state.tokens - 1)
+                    if state.remaining:
+                        state.remaining -= 1
+                    state.requests += 1
+                    state.last_used = wall
+                    if wait > 0:
+                        logger.warning(
+                            f"all {self.provider} api keys are rate limited, using the one available in {wait:.0f} seconds"
+                        )
+                    return best[1]
+            time.sleep(min(wait, 1.0))
+
+    def update(self, key: str, status_code: int, headers):
+        """
+        Sync the key with the rate-limit headers of a response, and cool it
+        down when the provider answered 429
+        """
+        wall = time.time()
+        remaining = _header_int(headers, "X-Ratelimit-Remaining")
+        limit = _header_int(headers, "X-Ratelimit-Limit")
+        reset = _header_int(headers, "X-Ratelimit-Reset")
+        retry_after = _header_int(headers, "Retry-After")
+        with self._lock:
+            state = self._state(key)
+            if remaining is not None:
+                state.remaining = remaining
+            if limit is not None:
+                state.limit = limit
+            if reset is not None:
+                # pexels sends a unix timestamp, pixabay the seconds left
+                state.reset_at = reset if reset > 1e9 else wall + reset
+            if status_code == 429:
+                state.throttled += 1
+                if retry_after is not None:
+                    state.cooldown_until = wall + retry_after
+                elif state.reset_at > wall:
+                    state.cooldown_until = state.reset_at
+                else:
+                    state.cooldown_until = wall + _DEFAULT_COOLDOWN
+                logger.warning(
+                    f"{self.provider} api key ...{key[-4:]} is rate limited, cooling down for {state.cooldown_until - wall:.0f} seconds"
+                )
+
+    def metrics(self) -> List[dict]:
+        wall = time.time()
+        now = time.monotonic()
+        with self._lock:
+            metrics = []
+            for key, state in self._states.items():
+                self._refill(state, now)
+                metrics.append(
+                    {
+                        "key": f"...{key[-4:]}",
+                        "requests": state.requests,
+                        "throttled": state.throttled,
+                        "tokens": round(state.tokens, 2),
+                        "remaining": state.remaining,
+                        "limit": state.limit,
+                        "reset_at": state.reset_at,
+                        "cooling_down": state.cooldown_until > wall,
+                        "last_used": state.last_used,
+                    }
+                )
+            return metrics
+
+
+schedulers = {
+    provider: KeyScheduler(provider, requests, window)
+    for provider, (requests, window) in _RATE_LIMITS.items()
+}
+
+
+def metrics() -> dict:
+    return {provider: s.metrics() for provider, s in schedulers.items()}
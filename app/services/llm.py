@@ -6,10 +6,10 @@ from typing import List
 
 import g4f
 from loguru import logger
-from openai import AzureOpenAI, OpenAI
 from openai.types.chat import ChatCompletion
 
 from app.config import config
+from app.services import clients
 
 _max_retries = 5
 
@@ -110,7 +110,9 @@ def _generate_response(prompt: str) -> str:
                     }
                     
                     # Make the API request
-                    response = requests.post(base_url, headers=headers, json=payload)
+                    response = clients.session("llm").post(
+                        base_url, headers=headers, json=payload, timeout=clients.llm_timeout()
+                    )
                     response.raise_for_status()
                     result = response.json()
                     
@@ -211,7 +213,7 @@ def _generate_response(prompt: str) -> str:
                 return generated_text
 
             if llm_provider == "cloudflare":
-                response = requests.post(
+                response = clients.session("llm").post(
                     f"https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run/{model_name}",
                     headers={"Authorization": f"Bearer {api_key}"},
                     json={
@@ -223,19 +225,21 @@ def _generate_response(prompt: str) -> str:
                             {"role": "user", "content": prompt},
                         ]
                     },
+                    timeout=clients.llm_timeout(),
                 )
                 result = response.json()
                 logger.info(result)
                 return result["result"]["response"]
 
             if llm_provider == "ernie":
-                response = requests.post(
-                    "https://aip.baidubce.com/oauth/2.0/token", 
+                response = clients.session("llm").post(
+                    "https://aip.baidubce.com/oauth/2.0/token",
                     params={
                         "grant_type": "client_credentials",
                         "client_id": api_key,
                         "client_secret": secret_key,
-                    }
+                    },
+                    timeout=clients.llm_timeout(),
                 )
                 access_token = response.json().get("access_token")
                 url = f"{base_url}?access_token={access_token}"
@@ -253,22 +257,19 @@ def _generate_response(prompt: str) -> str:
                 )
                 headers = {"Content-Type": "application/json"}
 
-                response = requests.request(
-                    "POST", url, headers=headers, data=payload
-                ).json()
+                response = (
+                    clients.session("llm")
+                    .post(url, headers=headers, data=payload, timeout=clients.llm_timeout())
+                    .json()
+                )
                 return response.get("result")
 
-            if llm_provider == "azure":
-                client = AzureOpenAI(
-                    api_key=api_key,
-                    api_version=api_version,
-                    azure_endpoint=base_url,
-                )
-            else:
-                client = OpenAI(
-                    api_key=api_key,
-                    base_url=base_url,
-                )
+            client = clients.openai_client(
+                provider=llm_provider,
+                api_key=api_key,
+                base_url=base_url,
+                api_version=api_version,
+            )
 
             response = client.chat.completions.create(
                 model=model_name, messages=[{"role": "user", "content": prompt}]
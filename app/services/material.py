@@ -1,34 +1,112 @@
+import hashlib
+import itertools
+import math
 import os
 import random
-from typing import List
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlencode
 
-import requests
 from loguru import logger
 from moviepy.video.io.VideoFileClip import VideoFileClip
 
 from app.config import config
 from app.models.schema import MaterialInfo, VideoAspect, VideoConcatMode
+from app.services import (
+    cache_manager,
+    clients,
+    key_scheduler,
+    material_library,
+    search_cache,
+)
+from app.services.utils import media_probe
 from app.utils import utils
 
-requested_count = 0
-
-
-def get_api_key(cfg_key: str):
-    api_keys = config.app.get(cfg_key)
-    if not api_keys:
-        raise ValueError(
-            f"\n\n##### {cfg_key} is not set #####\n\nPlease set it in the config.toml file: {config.config_file}\n\n"
-            f"{utils.to_json(config.app)}"
-        )
-
-    # if only one key is provided, return it
-    if isinstance(api_keys, str):
-        return api_keys
-
-    global requested_count
-    requested_count += 1
-    return api_keys[requested_count % len(api_keys)]
+# downloads in flight per provider, shared by all tasks
+_download_slots: Dict[str, threading.BoundedSemaphore] = {}
+_download_slots_lock = threading.Lock()
+
+
+def max_downloads() -> int:
+    return max(1, int(config.app.get("max_downloads_per_provider", 4)))
+
+
+def _provider_slots(provider: str) -> threading.BoundedSemaphore:
+    with _download_slots_lock:
+        slots = _download_slots.get(provider)
+        if slots is None:
+            slots = threading.BoundedSemaphore(max_downloads())
+            _download_slots[provider] = slots
+        return slots
+
+
+def _api_get(provider: str, api_keys: List[str], send):
+    """
+    send(api_key) with the key the scheduler picks, once more with another key
+    when the provider answers that the first one is rate limited
+    """
+    scheduler = key_scheduler.schedulers[provider]
+    for _ in range(min(2, len(api_keys))):
+        api_key = scheduler.acquire()
+        r = send(api_key)
+        scheduler.update(api_key, r.status_code, r.headers)
+        if r.status_code != 429:
+            break
+    return r
+
+
+def select_rendition(
+    renditions: List[dict],
+    video_width: int,
+    video_height: int,
+    aspect_tolerance: float = 0.15,
+) -> Optional[dict]:
+    """
+    Cheapest rendition that still covers the output resolution.
+
+    combine_videos scales every clip to fit the output frame, so a rendition
+    is adequate when it does not have to be upscaled for that, i.e. it is at
+    least as wide or as tall as the frame in its limiting dimension. Among the
+    adequate renditions with an aspect ratio close to the output, the one with
+    the smallest file size (or pixel count when the size is unknown) wins;
+    the closer aspect ratio breaks ties. Renditions of another aspect are
+    only considered when there is no close one.
+
+    Every rendition is a dict with url, width, height and optionally size.
+    Returns the chosen rendition with integer width / height, or None.
+    """
+    target_ratio = video_width / video_height
+    candidates = []
+    for r in renditions:
+        try:
+            w, h = int(r.get("width") or 0), int(r.get("height") or 0)
+        except (TypeError, ValueError):
+            continue
+        if not r.get("url") or w <= 0 or h <= 0:
+            continue
+        # scale applied to fit the frame, above 1 means upscaling
+        if min(video_width / w, video_height / h) > 1.0:
+            continue
+        aspect_error = abs(w / h - target_ratio) / target_ratio
+        size = int(r.get("size") or 0)
+        cost = size if size > 0 else w * h
+        candidates.append((cost, aspect_error, {**r, "width": w, "height": h}))
+
+    if not candidates:
+        return None
+    # a different aspect ratio is letterboxed, only used when nothing closer exists
+    close = [c for c in candidates if c[1] <= aspect_tolerance]
+    candidates = close or candidates
+    # sizes and pixel counts are not comparable, prefer known sizes only
+    # when every candidate has one
+    if not all(int(c[2].get("size") or 0) > 0 for c in candidates):
+        candidates = [(c[2]["width"] * c[2]["height"], c[1], c[2]) for c in candidates]
+    return min(candidates, key=lambda c: (c[0], c[1]))[2]
 
 
 def search_videos_pexels(
@@ -39,24 +117,28 @@ def search_videos_pexels(
     aspect = VideoAspect(video_aspect)
     video_orientation = aspect.name
     video_width, video_height = aspect.to_resolution()
-    api_key = get_api_key("pexels_api_keys")
-    headers = {
-        "Authorization": api_key,
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
-    }
+    # raises when no key is set, before the request errors are caught below
+    api_keys = key_scheduler.schedulers["pexels"].keys()
     # Build URL
     params = {"query": search_term, "per_page": 20, "orientation": video_orientation}
     query_url = f"https://api.pexels.com/videos/search?{urlencode(params)}"
     logger.info(f"searching videos: {query_url}, with proxies: {config.proxy}")
 
-    try:
-        r = requests.get(
+    def send(api_key: str):
+        headers = {
+            "Authorization": api_key,
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
+        }
+        return clients.session("material").get(
             query_url,
             headers=headers,
             proxies=config.proxy,
             verify=False,
             timeout=(30, 60),
         )
+
+    try:
+        r = _api_get("pexels", api_keys, send)
         response = r.json()
         video_items = []
         if "videos" not in response:
@@ -69,18 +151,24 @@ def search_videos_pexels(
             # check if video has desired minimum duration
             if duration < minimum_duration:
                 continue
-            video_files = v["video_files"]
-            # loop through each url to determine the best quality
-            for video in video_files:
-                w = int(video["width"])
-                h = int(video["height"])
-                if w == video_width and h == video_height:
-                    item = MaterialInfo()
-                    item.provider = "pexels"
-                    item.url = video["link"]
-                    item.duration = duration
-                    video_items.append(item)
-                    break
+            renditions = [
+                {
+                    "url": f.get("link"),
+                    "width": f.get("width"),
+                    "height": f.get("height"),
+                    "size": f.get("size"),
+                }
+                for f in v["video_files"]
+            ]
+            video = select_rendition(renditions, video_width, video_height)
+            if video:
+                item = MaterialInfo()
+                item.provider = "pexels"
+                item.url = video["url"]
+                item.duration = duration
+                item.width = video["width"]
+                item.height = video["height"]
+                video_items.append(item)
         return video_items
     except Exception as e:
         logger.error(f"search videos failed: {str(e)}")
@@ -97,21 +185,25 @@ def search_videos_pixabay(
 
     video_width, video_height = aspect.to_resolution()
 
-    api_key = get_api_key("pixabay_api_keys")
-    # Build URL
-    params = {
-        "q": search_term,
-        "video_type": "all",  # Accepted values: "all", "film", "animation"
-        "per_page": 50,
-        "key": api_key,
-    }
-    query_url = f"https://pixabay.com/api/videos/?{urlencode(params)}"
-    logger.info(f"searching videos: {query_url}, with proxies: {config.proxy}")
-
-    try:
-        r = requests.get(
+    # raises when no key is set, before the request errors are caught below
+    api_keys = key_scheduler.schedulers["pixabay"].keys()
+
+    def send(api_key: str):
+        # Build URL
+        params = {
+            "q": search_term,
+            "video_type": "all",  # Accepted values: "all", "film", "animation"
+            "per_page": 50,
+            "key": api_key,
+        }
+        query_url = f"https://pixabay.com/api/videos/?{urlencode(params)}"
+        logger.info(f"searching videos: {query_url}, with proxies: {config.proxy}")
+        return clients.session("material").get(
             query_url, proxies=config.proxy, verify=False, timeout=(30, 60)
         )
+
+    try:
+        r = _api_get("pixabay", api_keys, send)
         response = r.json()
         video_items = []
         if "hits" not in response:
@@ -124,19 +216,17 @@ def search_videos_pixabay(
             # check if video has desired minimum duration
             if duration < minimum_duration:
                 continue
-            video_files = v["videos"]
-            # loop through each url to determine the best quality
-            for video_type in video_files:
-                video = video_files[video_type]
-                w = int(video["width"])
-                # h = int(video["height"])
-                if w >= video_width:
-                    item = MaterialInfo()
-                    item.provider = "pixabay"
-                    item.url = video["url"]
-                    item.duration = duration
-                    video_items.append(item)
-                    break
+            video = select_rendition(
+                list(v["videos"].values()), video_width, video_height
+            )
+            if video:
+                item = MaterialInfo()
+                item.provider = "pixabay"
+                item.url = video["url"]
+                item.duration = duration
+                item.width = video["width"]
+                item.height = video["height"]
+                video_items.append(item)
         return video_items
     except Exception as e:
         logger.error(f"search videos failed: {str(e)}")
@@ -144,7 +234,248 @@ def search_videos_pixabay(
     return []
 
 
-def save_video(video_url: str, save_dir: str = "") -> str:
+def search_videos(
+    source: str,
+    search_term: str,
+    minimum_duration: int,
+    video_aspect: VideoAspect = VideoAspect.portrait,
+) -> List[MaterialInfo]:
+    """
+    Search a provider, answering repeated queries from the search cache
+    """
+    aspect = VideoAspect(video_aspect).value
+    cached = search_cache.cache.get(source, search_term, aspect, minimum_duration)
+    if cached is not None:
+        logger.info(f"search cache hit: {source}, '{search_term}', {len(cached)} videos")
+        return cached
+
+    search = search_videos_pixabay if source == "pixabay" else search_videos_pexels
+    video_items = search(
+        search_term=search_term,
+        minimum_duration=minimum_duration,
+        video_aspect=video_aspect,
+    )
+    # empty results are not cached, they are also what a failed request returns
+    if video_items:
+        search_cache.cache.put(source, search_term, aspect, minimum_duration, video_items)
+    return video_items
+
+
+SEARCH_PROVIDERS = ("pexels", "pixabay")
+
+
+def search_providers(source: str) -> List[str]:
+    """
+    The task's source first, plus the providers listed in `search_providers`
+    that have API keys
+    """
+    providers = [source]
+    for provider in config.app.get("search_providers", []) or []:
+        if provider not in SEARCH_PROVIDERS or provider in providers:
+            continue
+        try:
+            # only blank keys count as no keys
+            key_scheduler.schedulers[provider].keys()
+        except ValueError:
+            continue
+        providers.append(provider)
+    return providers
+
+
+def search_all(
+    providers: List[str],
+    search_terms: List[str],
+    minimum_duration: int,
+    video_aspect: VideoAspect = VideoAspect.portrait,
+    timeout: float = None,
+) -> List[Tuple[str, List[MaterialInfo]]]:
+    """
+    Query every provider for every term at once.
+
+    Returns (term, items) per term in the order of search_terms, with the items
+    of the providers in the order of providers. A provider that does not answer
+    within the timeout (`search_timeout` seconds) is left out of the results.
+    The first provider is the task's source: when its API keys are not set,
+    the ValueError is raised so the task fails with that message.
+    """
+    if timeout is None:
+        timeout = float(config.app.get("search_timeout", 20))
+    pairs = [(p, t) for t in search_terms for p in providers]
+    if not pairs:
+        return []
+
+    executor = ThreadPoolExecutor(max_workers=min(16, len(pairs)), thread_name_prefix="search")
+    try:
+        futures = [
+            executor.submit(search_videos, provider, term, minimum_duration, video_aspect)
+            for provider, term in pairs
+        ]
+        deadline = time.monotonic() + timeout
+        results = {}
+        for (provider, term), future in zip(pairs, futures):
+            try:
+                items = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FuturesTimeoutError:
+                logger.warning(f"search timed out after {timeout} seconds: {provider}, '{term}'")
+                continue
+            except Exception as e:
+                # missing api keys of the task's source fail the task
+                if isinstance(e, ValueError) and provider == providers[0]:
+                    raise
+                logger.error(f"search videos failed: {provider}, '{term}' => {str(e)}")
+                continue
+            logger.info(f"found {len(items)} videos for '{term}' on {provider}")
+            results.setdefault(term, []).extend(items)
+    finally:
+        # requests still running end with their own http timeout
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [(term, results.get(term, [])) for term in search_terms]
+
+
+def _cached_hashes(save_dir: str) -> set:
+    """
+    url hashes of the clips in the material cache, complete or trimmed
+    """
+    directory = save_dir or utils.storage_dir("cache_videos")
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return set()
+    # vid-<md5>.mp4 or vid-<md5>-<seconds>s.mp4
+    return {n[4:36] for n in names if n.startswith("vid-") and n.endswith(".mp4")}
+
+
+def rank_videos(
+    items: List[MaterialInfo],
+    video_aspect: VideoAspect,
+    target_duration: float,
+    save_dir: str = "",
+    shuffle: bool = False,
+) -> List[MaterialInfo]:
+    """
+    Best candidates first: clips already in the material cache, then by how
+    close the duration is to target_duration and the resolution to the output.
+    Ties keep the original order.
+
+    With shuffle, the order is a random sample weighted by that score, so
+    better clips tend to come first but tasks with the same terms do not
+    always get the same clips.
+    """
+    video_width, video_height = VideoAspect(video_aspect).to_resolution()
+    cached_hashes = _cached_hashes(save_dir)
+
+    def score(item: MaterialInfo) -> float:
+        cached = 2.0 if utils.md5(item.url.split("?")[0]) in cached_hashes else 0.0
+        duration_fit = 0.0
+        if item.duration > 0 and target_duration > 0:
+            duration_fit = min(item.duration, target_duration) / max(item.duration, target_duration)
+        # unknown resolution is neither rewarded nor penalized
+        resolution_fit = 0.5
+        if item.width > 0 and item.height > 0:
+            scale = min(item.width / video_width, item.height / video_height)
+            resolution_fit = min(scale, 1 / scale)
+        return cached + duration_fit + resolution_fit
+
+    if shuffle:
+        # weighted sampling without replacement: u ** (1 / weight) per item
+        return sorted(
+            items,
+            key=lambda item: random.random() ** (1 / (score(item) + 0.01)),
+            reverse=True,
+        )
+    return sorted(items, key=score, reverse=True)
+
+
+_path_locks: Dict[str, threading.Lock] = {}
+_path_locks_lock = threading.Lock()
+
+
+def _path_lock(path: str) -> threading.Lock:
+    with _path_locks_lock:
+        lock = _path_locks.get(path)
+        if lock is None:
+            lock = threading.Lock()
+            _path_locks[path] = lock
+        return lock
+
+
+def _etag_md5(etag: str) -> str:
+    """
+    The ETag is only usable as a checksum when it is a plain md5 of the content
+    (not weak, not a multipart upload tag)
+    """
+    etag = (etag or "").strip().strip('"').lower()
+    if len(etag) == 32 and all(c in "0123456789abcdef" for c in etag):
+        return etag
+    return ""
+
+
+def _download_to(video_url: str, part_path: str, cancel_event: threading.Event = None) -> bool:
+    """
+    Stream the url into part_path, resuming from the bytes already there.
+    Returns True once the file is complete and verified.
+    """
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+    }
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+
+    with clients.session("material").get(
+        video_url,
+        headers=headers,
+        proxies=config.proxy,
+        verify=False,
+        timeout=(60, 240),
+        stream=True,
+    ) as r:
+        if r.status_code == 416:
+            # the range starts past the end of the file, start over
+            os.remove(part_path)
+            return _download_to(video_url, part_path, cancel_event)
+        r.raise_for_status()
+        if r.status_code != 206:
+            offset = 0
+
+        expected_size = 0
+        content_length = r.headers.get("Content-Length")
+        if content_length and content_length.isdigit():
+            expected_size = offset + int(content_length)
+        expected_md5 = _etag_md5(r.headers.get("ETag"))
+
+        md5 = hashlib.md5() if expected_md5 else None
+        if md5 and offset:
+            with open(part_path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    md5.update(block)
+
+        if offset:
+            logger.info(f"resuming download at {offset} bytes: {video_url}")
+        with open(part_path, "ab" if offset else "wb") as f:
+            for chunk in r.iter_content(chunk_size=1024 * 1024):
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info(f"download cancelled, kept {f.tell()} bytes: {part_path}")
+                    return False
+                if chunk:
+                    f.write(chunk)
+                    if md5:
+                        md5.update(chunk)
+
+    size = os.path.getsize(part_path)
+    if expected_size and size != expected_size:
+        logger.warning(f"incomplete download: {size} of {expected_size} bytes: {video_url}")
+        if size > expected_size:
+            os.remove(part_path)
+        return False
+    if md5 and md5.hexdigest() != expected_md5:
+        logger.warning(f"checksum mismatch, discarded: {video_url}")
+        os.remove(part_path)
+        return False
+    return size > 0
+
+
+def _video_path(video_url: str, save_dir: str) -> str:
     if not save_dir:
         save_dir = utils.storage_dir("cache_videos")
 
@@ -154,46 +485,272 @@ def save_video(video_url: str, save_dir: str = "") -> str:
     url_without_query = video_url.split("?")[0]
     url_hash = utils.md5(url_without_query)
     video_id = f"vid-{url_hash}"
-    video_path = f"{save_dir}/{video_id}.mp4"
-
-    # if video already exists, return the path
-    if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
-        logger.info(f"video already exists: {video_path}")
-        return video_path
+    return f"{save_dir}/{video_id}.mp4"
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
-    }
 
-    # if video does not exist, download it
-    with open(video_path, "wb") as f:
-        f.write(
-            requests.get(
-                video_url,
-                headers=headers,
-                proxies=config.proxy,
-                verify=False,
-                timeout=(60, 240),
-            ).content
-        )
+def _validate_video(video_path: str) -> bool:
+    # MP4 / WebM are checked from their container headers, which also puts
+    # the clip's duration and size in the probe cache for combine_videos.
+    # Whatever the headers do not confirm is left to ffmpeg.
+    info = media_probe.probe_video(video_path)
+    if info is not None and info.fps > 0:
+        return True
 
-    if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
+    try:
+        clip = VideoFileClip(video_path)
+        duration = clip.duration
+        fps = clip.fps
+        clip.close()
+        if duration > 0 and fps > 0:
+            return True
+    except Exception as e:
         try:
-            clip = VideoFileClip(video_path)
-            duration = clip.duration
-            fps = clip.fps
-            clip.close()
-            if duration > 0 and fps > 0:
-                return video_path
-        except Exception as e:
-            try:
-                os.remove(video_path)
-            except Exception:
-                pass
-            logger.warning(f"invalid video file: {video_path} => {str(e)}")
+            os.remove(video_path)
+        except Exception:
+            pass
+        logger.warning(f"invalid video file: {video_path} => {str(e)}")
+    return False
+
+
+def save_video(
+    video_url: str, save_dir: str = "", cancel_event: threading.Event = None
+) -> str:
+    video_path = _video_path(video_url, save_dir)
+
+    # tasks asking for the same video wait for the one download in progress
+    with _path_lock(video_path):
+        # files only appear under the final name once complete
+        if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
+            logger.info(f"video already exists: {video_path}")
+            cache_manager.manager.touch(video_path, hit=True)
+            return video_path
+
+        part_path = f"{video_path}.part"
+        if not _download_to(video_url, part_path, cancel_event):
+            return ""
+        os.replace(part_path, video_path)
+        cache_manager.manager.touch(video_path, hit=False)
+        if _validate_video(video_path):
+            return video_path
     return ""
 
 
+def _fetch_range(video_url: str, start: int, end: int) -> Tuple[bytes, int]:
+    """
+    Bytes start..end (inclusive) of the url, and the size of the whole file.
+    Raises ValueError when the server ignores the range.
+    """
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
+        "Range": f"bytes={start}-{end}",
+    }
+    with clients.session("material").get(
+        video_url,
+        headers=headers,
+        proxies=config.proxy,
+        verify=False,
+        timeout=(60, 240),
+        stream=True,
+    ) as r:
+        r.raise_for_status()
+        # Content-Range: bytes 0-65535/1234567
+        total = r.headers.get("Content-Range", "").rpartition("/")[2]
+        if r.status_code != 206 or not total.isdigit():
+            raise ValueError(f"range requests not supported: {video_url}")
+        return r.raw.read(end - start + 1, decode_content=True), int(total)
+
+
+def _mp4_moov(video_url: str) -> Tuple[bytes, bytes, int, int]:
+    """
+    (first bytes of the file, moov box, offset of the moov box, file size) of
+    a remote MP4, found by walking the top-level box headers with range requests
+    """
+    head, total = _fetch_range(video_url, 0, 64 * 1024 - 1)
+    offset = 0
+    while offset + 8 <= total:
+        if offset + 16 <= len(head):
+            h = head[offset : offset + 16]
+        else:
+            h = _fetch_range(video_url, offset, min(offset + 15, total - 1))[0]
+        header = media_probe.mp4_box_header(h)
+        if header is None or header[2] == 0:
+            break
+        box_type, _, size = header
+        if box_type == "moov":
+            if offset + size <= len(head):
+                return head, head[offset : offset + size], offset, total
+            moov = _fetch_range(video_url, offset, offset + size - 1)[0]
+            return head, moov, offset, total
+        offset += size
+    raise ValueError(f"no moov box found: {video_url}")
+
+
+def _stream_range(
+    video_url: str, start: int, end: int, f, cancel_event: threading.Event = None
+) -> bool:
+    """
+    Append bytes start..end (inclusive) of the url to f
+    """
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36",
+        "Range": f"bytes={start}-{end}",
+    }
+    with clients.session("material").get(
+        video_url,
+        headers=headers,
+        proxies=config.proxy,
+        verify=False,
+        timeout=(60, 240),
+        stream=True,
+    ) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise ValueError(f"range requests not supported: {video_url}")
+        for chunk in r.iter_content(chunk_size=1024 * 1024):
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info(f"download cancelled: {video_url}")
+                return False
+            if chunk:
+                f.write(chunk)
+    return True
+
+
+def _download_slice(
+    video_url: str, slice_path: str, seconds: float, cancel_event: threading.Event = None
+) -> Optional[bool]:
+    """
+    Fetch only the first `seconds` of a remote MP4 and remux them into slice_path.
+
+    The moov box tells where the samples of the window end. That prefix and the
+    moov box (when it is stored after the media data) are written at their
+    original offsets into a sparse copy of the file, which ffmpeg reads like
+    the complete file as long as it stays within the window.
+
+    Returns None when a slice is not possible or not worth it, the caller then
+    downloads the whole file. False when cancelled or failed.
+    """
+    try:
+        head, moov, moov_offset, total = _mp4_moov(video_url)
+    except Exception as e:
+        logger.info(f"partial download not possible: {str(e)}")
+        return None
+    end = media_probe.mp4_prefix_end(moov, seconds)
+    if not end or end > total:
+        logger.info(f"partial download not possible, sample tables not understood: {video_url}")
+        return None
+    needed = end + (len(moov) if moov_offset >= end else 0)
+    if needed > total * 0.8:
+        return None
+
+    source_path = f"{slice_path}.src.part"
+    try:
+        with open(source_path, "wb") as f:
+            # the head is already here, only the rest of the prefix is fetched
+            f.write(head[:end])
+            if end > len(head) and not _stream_range(
+                video_url, len(head), end - 1, f, cancel_event
+            ):
+                return False
+            if f.tell() != end:
+                logger.warning(f"incomplete download: {f.tell()} of {end} bytes: {video_url}")
+                return False
+            if moov_offset >= end:
+                f.seek(moov_offset)
+                f.write(moov)
+
+        from moviepy.config import FFMPEG_BINARY
+
+        cmd = [
+            FFMPEG_BINARY,
+            "-y",
+            "-loglevel",
+            "error",
+            "-i",
+            source_path,
+            "-t",
+            str(seconds),
+            "-map",
+            "0",
+            "-c",
+            "copy",
+            "-movflags",
+            "+faststart",
+            "-f",
+            "mp4",
+            f"{slice_path}.part",
+        ]
+        subprocess.run(cmd, check=True, capture_output=True)
+        os.replace(f"{slice_path}.part", slice_path)
+        logger.info(f"downloaded {needed} of {total} bytes for {seconds} seconds: {video_url}")
+        return True
+    except Exception as e:
+        stderr = getattr(e, "stderr", b"") or b""
+        logger.warning(
+            f"partial download failed: {video_url} => {str(e)} {stderr.decode(errors='ignore')}"
+        )
+        return False
+    finally:
+        for path in (source_path, f"{slice_path}.part"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def save_video_slice(
+    video_url: str,
+    seconds: float,
+    save_dir: str = "",
+    cancel_event: threading.Event = None,
+) -> str:
+    """
+    Save only the first `seconds` of the video, under a name of its own so it
+    is never mistaken for the complete clip. A complete clip already in the
+    cache is returned as is.
+    """
+    video_path = _video_path(video_url, save_dir)
+    seconds = int(math.ceil(seconds))
+    slice_path = f"{os.path.splitext(video_path)[0]}-{seconds}s.mp4"
+
+    with _path_lock(video_path):
+        for path in (video_path, slice_path):
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                logger.info(f"video already exists: {path}")
+                cache_manager.manager.touch(path, hit=True)
+                return path
+
+        result = _download_slice(video_url, slice_path, seconds, cancel_event)
+        if result:
+            cache_manager.manager.touch(slice_path, hit=False)
+            return slice_path if _validate_video(slice_path) else ""
+        if result is False:
+            return ""
+    return save_video(video_url, save_dir, cancel_event)
+
+
+def library_videos(
+    search_terms: List[str],
+    video_aspect: VideoAspect,
+    max_clip_duration: int,
+    budget: float,
+) -> Tuple[List[str], float]:
+    """
+    Clips from the local material library for the search terms, until their
+    usable duration reaches the budget
+    """
+    aspect = VideoAspect(video_aspect).value
+    paths = []
+    duration = 0.0
+    for search_term in search_terms:
+        for path, clip_duration in material_library.library.find(
+            search_term, aspect, min_duration=max_clip_duration
+        ):
+            if duration >= budget:
+                return paths, duration
+            if path not in paths:
+                paths.append(path)
+                duration += min(max_clip_duration, clip_duration)
+    return paths, duration
+
+
 def download_videos(
     task_id: str,
     search_terms: List[str],
@@ -203,65 +760,226 @@ def download_videos(
     audio_duration: float = 0.0,
     max_clip_duration: int = 5,
 ) -> List[str]:
-    valid_video_items = []
-    valid_video_urls = []
-    found_duration = 0.0
-    search_videos = search_videos_pexels
-    if source == "pixabay":
-        search_videos = search_videos_pixabay
+    material_directory = config.app.get("material_directory", "").strip()
+    use_library = material_directory != "task"
+    if material_directory == "task":
+        material_directory = utils.task_dir(task_id)
+    elif material_directory and not os.path.isdir(material_directory):
+        material_directory = ""
 
-    for search_term in search_terms:
-        video_items = search_videos(
-            search_term=search_term,
-            minimum_duration=max_clip_duration,
-            video_aspect=video_aspect,
+    video_paths = []
+    total_duration = 0.0
+    # reuse clips downloaded for the same terms before, but keep at least
+    # `material_freshness_ratio` of the duration for newly downloaded clips
+    freshness_ratio = float(config.app.get("material_freshness_ratio", 0.3))
+    freshness_ratio = min(1.0, max(0.0, freshness_ratio))
+    if use_library and freshness_ratio < 1.0:
+        video_paths, total_duration = library_videos(
+            search_terms,
+            video_aspect,
+            max_clip_duration,
+            budget=audio_duration * (1 - freshness_ratio),
         )
-        logger.info(f"found {len(video_items)} videos for '{search_term}'")
-
+        if video_paths:
+            logger.info(
+                f"found {len(video_paths)} videos in the material library, duration: {total_duration} seconds"
+            )
+            # the task unpins its clips when it ends, see task.start
+            cache_manager.manager.pin(video_paths, task_id)
+        if total_duration > audio_duration:
+            material_library.library.mark_used(video_paths)
+            return video_paths
+
+    providers = search_providers(source)
+    if video_contact_mode.value == VideoConcatMode.sequential.value:
+        target_duration = max_clip_duration
+    else:
+        # random mode cuts every clip into several subclips
+        target_duration = max(max_clip_duration, audio_duration / max(1, len(search_terms)))
+
+    valid_video_urls = set()
+    item_terms = {}
+    ranked = []
+    found_duration = 0.0
+    for search_term, video_items in search_all(
+        providers, search_terms, max_clip_duration, video_aspect
+    ):
+        unique_items = []
         for item in video_items:
             if item.url not in valid_video_urls:
-                valid_video_items.append(item)
-                valid_video_urls.append(item.url)
+                unique_items.append(item)
+                valid_video_urls.add(item.url)
+                item_terms[item.url] = search_term
                 found_duration += item.duration
+        ranked.append(
+            rank_videos(
+                unique_items,
+                video_aspect,
+                target_duration,
+                material_directory,
+                shuffle=video_contact_mode.value == VideoConcatMode.random.value,
+            )
+        )
+
+    if video_contact_mode.value == VideoConcatMode.sequential.value:
+        # clips follow the order of the terms
+        valid_video_items = [item for items in ranked for item in items]
+    else:
+        # every term in turn, each in its score-weighted random order
+        valid_video_items = [
+            item
+            for group in itertools.zip_longest(*ranked)
+            for item in group
+            if item is not None
+        ]
 
     logger.info(
-        f"found total videos: {len(valid_video_items)}, required duration: {audio_duration} seconds, found duration: {found_duration} seconds"
+        f"found total videos: {len(valid_video_items)} from {', '.join(providers)}, required duration: {audio_duration} seconds, found duration: {found_duration} seconds"
     )
-    video_paths = []
-
-    material_directory = config.app.get("material_directory", "").strip()
-    if material_directory == "task":
-        material_directory = utils.task_dir(task_id)
-    elif material_directory and not os.path.isdir(material_directory):
-        material_directory = ""
-
-    if video_contact_mode.value == VideoConcatMode.random.value:
-        random.shuffle(valid_video_items)
 
-    total_duration = 0.0
-    for item in valid_video_items:
-        try:
+    # sequential concat only uses the first max_clip_duration seconds of
+    # every clip, there is no need to download the rest (one second more
+    # than that, the cut of a stream copy falls on a packet boundary)
+    slice_seconds = 0
+    if (
+        config.app.get("material_partial_download", False)
+        and video_contact_mode.value == VideoConcatMode.sequential.value
+    ):
+        slice_seconds = max_clip_duration + 1
+
+    cancel_event = threading.Event()
+
+    def download(item: MaterialInfo) -> str:
+        with _provider_slots(item.provider):
+            if cancel_event.is_set():
+                return ""
             logger.info(f"downloading video: {item.url}")
-            saved_video_path = save_video(
-                video_url=item.url, save_dir=material_directory
+            if slice_seconds and item.duration > slice_seconds:
+                return save_video_slice(
+                    video_url=item.url,
+                    seconds=slice_seconds,
+                    save_dir=material_directory,
+                    cancel_event=cancel_event,
+                )
+            return save_video(
+                video_url=item.url,
+                save_dir=material_directory,
+                cancel_event=cancel_event,
             )
-            if saved_video_path:
+
+    # downloads run ahead of the item being consumed, at most `in_flight` of
+    # them, but results are taken in the order of the list so the concat mode
+    # keeps its meaning
+    in_flight = max_downloads()
+    executor = ThreadPoolExecutor(max_workers=in_flight, thread_name_prefix="download")
+    futures = {}
+    submitted = 0
+    try:
+        for idx, item in enumerate(valid_video_items):
+            while submitted < len(valid_video_items) and submitted < idx + in_flight:
+                futures[submitted] = executor.submit(download, valid_video_items[submitted])
+                submitted += 1
+            try:
+                saved_video_path = futures.pop(idx).result()
+            except Exception as e:
+                logger.error(f"failed to download video: {utils.to_json(item)} => {str(e)}")
+                continue
+            if saved_video_path and saved_video_path not in video_paths:
                 logger.info(f"video saved: {saved_video_path}")
                 video_paths.append(saved_video_path)
-                seconds = min(max_clip_duration, item.duration)
+                cache_manager.manager.pin([saved_video_path], task_id)
+                duration = item.duration
+                if slice_seconds and saved_video_path.endswith(f"-{slice_seconds}s.mp4"):
+                    duration = slice_seconds
+                if use_library:
+                    material_library.library.record(
+                        path=saved_video_path,
+                        provider=item.provider,
+                        url=item.url,
+                        search_term=item_terms.get(item.url, ""),
+                        duration=duration,
+                        aspect=VideoAspect(video_aspect).value,
+                        width=item.width,
+                        height=item.height,
+                    )
+                seconds = min(max_clip_duration, duration)
                 total_duration += seconds
                 if total_duration > audio_duration:
                     logger.info(
                         f"total duration of downloaded videos: {total_duration} seconds, skip downloading more"
                     )
                     break
-        except Exception as e:
-            logger.error(f"failed to download video: {utils.to_json(item)} => {str(e)}")
+    finally:
+        # queued downloads are dropped, running ones stop at the next chunk
+        # and keep their partial file for a later resume
+        cancel_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+    if use_library:
+        material_library.library.mark_used(video_paths)
     logger.success(f"downloaded {len(video_paths)} videos")
     return video_paths
 
 
+def partial_download_check(video_file: str, seconds: float = 6):
+    """
+    Slice a local MP4 through a loopback HTTP server that honours Range
+    headers, a stand-in for the providers' CDNs, and report the bytes read.
+    """
+    import shutil
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    with open(video_file, "rb") as f:
+        content = f.read()
+    served = []
+
+    class RangeHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            start, end = 0, len(content) - 1
+            ranged = self.headers.get("Range", "").startswith("bytes=")
+            if ranged:
+                first, _, last = self.headers["Range"][6:].partition("-")
+                start = int(first)
+                end = min(int(last), end) if last else end
+                if start > end:
+                    self.send_response(416)
+                    self.end_headers()
+                    return
+            body = content[start : end + 1]
+            served.append(len(body))
+            self.send_response(206 if ranged else 200)
+            self.send_header("Content-Length", str(len(body)))
+            if ranged:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(content)}")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    save_dir = tempfile.mkdtemp()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/{os.path.basename(video_file)}"
+        path = save_video_slice(url, seconds, save_dir)
+        clip = VideoFileClip(path)
+        logger.info(
+            f"slice: {path}, duration: {clip.duration:.2f}s, "
+            f"read {sum(served)} of {len(content)} bytes in {len(served)} requests"
+        )
+        clip.close()
+        return path, sum(served)
+    finally:
+        server.shutdown()
+        shutil.rmtree(save_dir, ignore_errors=True)
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "slice":
+        partial_download_check(sys.argv[2], float(sys.argv[3]) if len(sys.argv) > 3 else 6)
+        sys.exit(0)
+
     download_videos(
         "test123", ["Money Exchange Medium"], audio_duration=100, source="pixabay"
     )
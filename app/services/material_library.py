@@ -0,0 +1,157 @@
+"""
+Index of the downloaded video materials.
+
+Every clip saved to the material cache is recorded with its provider, source
+url, the search terms it was found for, duration, resolution and aspect, so
+later tasks can reuse it for the same terms without calling the providers.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from loguru import logger
+
+from app.utils import utils
+
+
+class MaterialLibrary:
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_file), exist_ok=True)
+            self._db = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS clips ("
+                "path TEXT PRIMARY KEY, provider TEXT, url TEXT, duration REAL, "
+                "width INTEGER, height INTEGER, aspect TEXT, usage_count INTEGER DEFAULT 0, "
+                "created_at REAL, last_used_at REAL);"
+                "CREATE TABLE IF NOT EXISTS clip_terms ("
+                "path TEXT, term TEXT, PRIMARY KEY (path, term));"
+                "CREATE INDEX IF NOT EXISTS idx_clip_terms_term ON clip_terms (term);"
+            )
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def _term(term: str) -> str:
+        return " ".join(term.lower().split())
+
+    def record(
+        self,
+        path: str,
+        provider: str,
+        url: str,
+        search_term: str,
+        duration: float,
+        aspect: str,
+        width: int = 0,
+        height: int = 0,
+    ):
+        path = os.path.realpath(path)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._conn()
+                conn.execute(
+                    "INSERT INTO clips (path, provider, url, duration, width, height, aspect, created_at, last_used_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET duration=excluded.duration, "
+                    "width=CASE WHEN excluded.width > 0 THEN excluded.width ELSE width END, "
+                    "height=CASE WHEN excluded.height > 0 THEN excluded.height ELSE height END",
+                    (path, provider, url, duration, width, height, aspect, now, now),
+                )
+                if search_term:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO clip_terms VALUES (?, ?)",
+                        (path, self._term(search_term)),
+                    )
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"failed to record material: {path} => {str(e)}")
+
+    def find(
+        self, search_term: str, aspect: str, min_duration: float = 0, limit: int = 20
+    ) -> List[Tuple[str, float]]:
+        """
+        (path, duration) of the clips found for the term in the same aspect,
+        least used first. Clips whose file is gone are dropped from the index.
+        """
+        with self._lock:
+            try:
+                rows = (
+                    self._conn()
+                    .execute(
+                        "SELECT c.path, c.duration FROM clips c "
+                        "JOIN clip_terms t ON t.path = c.path "
+                        "WHERE t.term = ? AND c.aspect = ? AND c.duration >= ? "
+                        "ORDER BY c.usage_count, c.last_used_at LIMIT ?",
+                        (self._term(search_term), aspect, min_duration, limit),
+                    )
+                    .fetchall()
+                )
+            except Exception as e:
+                logger.warning(f"failed to query material library: {str(e)}")
+                return []
+
+        clips = []
+        for path, duration in rows:
+            if os.path.isfile(path):
+                clips.append((path, duration))
+            else:
+                self.remove(path)
+        return clips
+
+    def usage(self, paths: List[str]) -> Dict[str, Tuple[int, float]]:
+        """
+        {path: (usage_count, last_used_at)} of the indexed paths
+        """
+        usage = {}
+        with self._lock:
+            try:
+                conn = self._conn()
+                for i in range(0, len(paths), 500):
+                    chunk = paths[i : i + 500]
+                    rows = conn.execute(
+                        "SELECT path, usage_count, last_used_at FROM clips WHERE path IN "
+                        f"({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    for path, count, last_used in rows:
+                        usage[path] = (count or 0, last_used or 0.0)
+            except Exception as e:
+                logger.warning(f"failed to query material library: {str(e)}")
+        return usage
+
+    def mark_used(self, paths: List[str]):
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._conn()
+                conn.executemany(
+                    "UPDATE clips SET usage_count = usage_count + 1, last_used_at = ? WHERE path = ?",
+                    [(now, os.path.realpath(p)) for p in paths],
+                )
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"failed to update material library: {str(e)}")
+
+    def remove(self, path: str):
+        path = os.path.realpath(path)
+        with self._lock:
+            try:
+                conn = self._conn()
+                conn.execute("DELETE FROM clips WHERE path = ?", (path,))
+                conn.execute("DELETE FROM clip_terms WHERE path = ?", (path,))
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"failed to remove material: {path} => {str(e)}")
+
+
+library = MaterialLibrary(os.path.join(utils.storage_dir(), "material_library.db"))
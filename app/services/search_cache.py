@@ -0,0 +1,132 @@
+"""
+Cache of video search results.
+
+Search terms repeat a lot across tasks, so the results of a (provider, term,
+aspect, minimum duration) query are kept for a configurable TTL: in a small
+in-memory LRU, and in SQLite so that they survive restarts.
+"""
+
+import dataclasses
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from loguru import logger
+
+from app.config import config
+from app.models.schema import MaterialInfo
+from app.utils import utils
+
+
+class SearchCache:
+    def __init__(self, db_file: str, ttl: int = 21600, max_entries: int = 256):
+        self.db_file = db_file
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._db = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_file), exist_ok=True)
+            self._db = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "provider TEXT, term TEXT, aspect TEXT, min_duration INTEGER, "
+                "expires_at REAL, items TEXT, "
+                "PRIMARY KEY (provider, term, aspect, min_duration))"
+            )
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def _key(provider: str, term: str, aspect: str, min_duration: int) -> tuple:
+        return provider, term.strip().lower(), str(aspect), int(min_duration)
+
+    def get(
+        self, provider: str, term: str, aspect: str, min_duration: int
+    ) -> Optional[List[MaterialInfo]]:
+        if self.ttl <= 0:
+            return None
+        key = self._key(provider, term, aspect, min_duration)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    return [MaterialInfo(**item) for item in entry[1]]
+                del self._memory[key]
+
+            try:
+                row = (
+                    self._conn()
+                    .execute(
+                        "SELECT expires_at, items FROM search_cache "
+                        "WHERE provider=? AND term=? AND aspect=? AND min_duration=?",
+                        key,
+                    )
+                    .fetchone()
+                )
+            except Exception as e:
+                logger.warning(f"failed to read search cache: {str(e)}")
+                return None
+            if not row or row[0] <= now:
+                return None
+            items = json.loads(row[1])
+            self._remember(key, (row[0], items))
+        return [MaterialInfo(**item) for item in items]
+
+    def put(
+        self,
+        provider: str,
+        term: str,
+        aspect: str,
+        min_duration: int,
+        items: List[MaterialInfo],
+    ):
+        if self.ttl <= 0:
+            return
+        key = self._key(provider, term, aspect, min_duration)
+        expires_at = time.time() + self.ttl
+        data = [dataclasses.asdict(item) for item in items]
+        with self._lock:
+            self._remember(key, (expires_at, data))
+            try:
+                conn = self._conn()
+                conn.execute(
+                    "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, expires_at, json.dumps(data)),
+                )
+                conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"failed to write search cache: {str(e)}")
+
+    def _remember(self, key: tuple, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            try:
+                conn = self._conn()
+                conn.execute("DELETE FROM search_cache")
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"failed to clear search cache: {str(e)}")
+
+
+cache = SearchCache(
+    db_file=os.path.join(utils.storage_dir(), "search_cache.db"),
+    ttl=int(config.app.get("search_cache_ttl", 21600)),
+    max_entries=int(config.app.get("search_cache_size", 256)),
+)
@@ -3,61 +3,44 @@ import os.path
 import re
 from timeit import default_timer as timer
 
-from faster_whisper import WhisperModel
 from loguru import logger
 
-from app.config import config
+from app.models.cues import Cues
+from app.services import alignment, whisper
 from app.utils import utils
 
-model_size = config.whisper.get("model_size", "large-v3")
-device = config.whisper.get("device", "cpu")
-compute_type = config.whisper.get("compute_type", "int8")
-model = None
-
 
 def create(audio_file, subtitle_file: str = ""):
-    global model
-    if not model:
-        model_path = f"{utils.root_dir()}/models/whisper-{model_size}"
-        model_bin_file = f"{model_path}/model.bin"
-        if not os.path.isdir(model_path) or not os.path.isfile(model_bin_file):
-            model_path = model_size
-
-        logger.info(
-            f"loading model: {model_path}, device: {device}, compute_type: {compute_type}"
-        )
-        try:
-            model = WhisperModel(
-                model_size_or_path=model_path, device=device, compute_type=compute_type
-            )
-        except Exception as e:
-            logger.error(
-                f"failed to load model: {e} \n\n"
-                f"********************************************\n"
-                f"this may be caused by network issue. \n"
-                f"please download the model manually and put it in the 'models' folder. \n"
-                f"see [README.md FAQ](https://github.com/harry0703/MoneyPrinterTurbo) for more details.\n"
-                f"********************************************\n\n"
-            )
-            return None
-
     logger.info(f"start, output file: {subtitle_file}")
     if not subtitle_file:
         subtitle_file = f"{audio_file}.srt"
 
-    segments, info = model.transcribe(
-        audio_file,
-        beam_size=5,
-        word_timestamps=True,
-        vad_filter=True,
-        vad_parameters=dict(min_silence_duration_ms=500),
-    )
+    try:
+        start = timer()
+        segments, language, probability = whisper.transcribe(audio_file)
+        logger.info(f"detected language: '{language}', probability: {probability:.2f}")
+        subtitles = segments_to_subtitles(segments)
+        end = timer()
+    except Exception as e:
+        logger.error(f"failed to transcribe audio: {audio_file} => {str(e)}")
+        return None
 
-    logger.info(
-        f"detected language: '{info.language}', probability: {info.language_probability:.2f}"
-    )
+    diff = end - start
+    logger.info(f"complete, elapsed: {diff:.2f} s")
 
-    start = timer()
+    Cues.from_items(
+        (subtitle.get("start_time"), subtitle.get("end_time"), subtitle.get("msg"))
+        for subtitle in subtitles
+        if subtitle.get("msg")
+    ).write(subtitle_file)
+    logger.info(f"subtitle file created: {subtitle_file}")
+    return segments
+
+
+def segments_to_subtitles(segments) -> list:
+    """
+    Break recognized segments into subtitle lines at punctuation
+    """
     subtitles = []
 
     def recognized(seg_text, seg_start, seg_end):
@@ -113,27 +96,7 @@ def create(audio_file, subtitle_file: str = ""):
 
         recognized(seg_text, seg_start, seg_end)
 
-    end = timer()
-
-    diff = end - start
-    logger.info(f"complete, elapsed: {diff:.2f} s")
-
-    idx = 1
-    lines = []
-    for subtitle in subtitles:
-        text = subtitle.get("msg")
-        if text:
-            lines.append(
-                utils.text_to_srt(
-                    idx, text, subtitle.get("start_time"), subtitle.get("end_time")
-                )
-            )
-            idx += 1
-
-    sub = "\n".join(lines) + "\n"
-    with open(subtitle_file, "w", encoding="utf-8") as f:
-        f.write(sub)
-    logger.info(f"subtitle file created: {subtitle_file}")
+    return subtitles
 
 
 def file_to_subtitles(filename):
@@ -158,124 +121,50 @@ def file_to_subtitles(filename):
     return times_texts
 
 
-def levenshtein_distance(s1, s2):
-    if len(s1) < len(s2):
-        return levenshtein_distance(s2, s1)
-
-    if len(s2) == 0:
-        return len(s1)
-
-    previous_row = range(len(s2) + 1)
-    for i, c1 in enumerate(s1):
-        current_row = [i + 1]
-        for j, c2 in enumerate(s2):
-            insertions = previous_row[j + 1] + 1
-            deletions = current_row[j] + 1
-            substitutions = previous_row[j] + (c1 != c2)
-            current_row.append(min(insertions, deletions, substitutions))
-        previous_row = current_row
-
-    return previous_row[-1]
-
-
-def similarity(a, b):
-    distance = levenshtein_distance(a.lower(), b.lower())
-    max_length = max(len(a), len(b))
-    return 1 - (distance / max_length)
-
+def _cue_words(cues: Cues) -> list:
+    """
+    Word timings spread over each cue by character position, for subtitle
+    files that were not produced from a transcript
+    """
+    words = []
+    for start, end, text in cues:
+        parts = text.split()
+        total = sum(len(p) for p in parts) or 1
+        t = start
+        for part in parts:
+            t_end = t + (end - start) * len(part) / total
+            words.append((t, t_end, part))
+            t = t_end
+    return words
+
+
+def correct(subtitle_file, video_script, audio_file: str = "", segments=None):
+    """
+    Rewrite the subtitle file with the script lines, timed by a global
+    alignment of the script against the recognized words
+    """
+    if segments is None and audio_file:
+        cached = whisper.cached_transcript(audio_file)
+        if cached:
+            segments = cached[0]
+
+    if segments:
+        words = [(w.start, w.end, w.word) for seg in segments for w in seg.words]
+    elif os.path.isfile(subtitle_file):
+        words = _cue_words(Cues.from_file(subtitle_file))
+    else:
+        words = []
 
-def correct(subtitle_file, video_script):
-    subtitle_items = file_to_subtitles(subtitle_file)
     script_lines = utils.split_string_by_punctuations(video_script)
-
-    corrected = False
-    new_subtitle_items = []
-    script_index = 0
-    subtitle_index = 0
-
-    while script_index < len(script_lines) and subtitle_index < len(subtitle_items):
-        script_line = script_lines[script_index].strip()
-        subtitle_line = subtitle_items[subtitle_index][2].strip()
-
-        if script_line == subtitle_line:
-            new_subtitle_items.append(subtitle_items[subtitle_index])
-            script_index += 1
-            subtitle_index += 1
-        else:
-            combined_subtitle = subtitle_line
-            start_time = subtitle_items[subtitle_index][1].split(" --> ")[0]
-            end_time = subtitle_items[subtitle_index][1].split(" --> ")[1]
-            next_subtitle_index = subtitle_index + 1
-
-            while next_subtitle_index < len(subtitle_items):
-                next_subtitle = subtitle_items[next_subtitle_index][2].strip()
-                if similarity(
-                    script_line, combined_subtitle + " " + next_subtitle
-                ) > similarity(script_line, combined_subtitle):
-                    combined_subtitle += " " + next_subtitle
-                    end_time = subtitle_items[next_subtitle_index][1].split(" --> ")[1]
-                    next_subtitle_index += 1
-                else:
-                    break
-
-            if similarity(script_line, combined_subtitle) > 0.8:
-                logger.warning(
-                    f"Merged/Corrected - Script: {script_line}, Subtitle: {combined_subtitle}"
-                )
-                new_subtitle_items.append(
-                    (
-                        len(new_subtitle_items) + 1,
-                        f"{start_time} --> {end_time}",
-                        script_line,
-                    )
-                )
-                corrected = True
-            else:
-                logger.warning(
-                    f"Mismatch - Script: {script_line}, Subtitle: {combined_subtitle}"
-                )
-                new_subtitle_items.append(
-                    (
-                        len(new_subtitle_items) + 1,
-                        f"{start_time} --> {end_time}",
-                        script_line,
-                    )
-                )
-                corrected = True
-
-            script_index += 1
-            subtitle_index = next_subtitle_index
-
-    # Process the remaining lines of the script.
-    while script_index < len(script_lines):
-        logger.warning(f"Extra script line: {script_lines[script_index]}")
-        if subtitle_index < len(subtitle_items):
-            new_subtitle_items.append(
-                (
-                    len(new_subtitle_items) + 1,
-                    subtitle_items[subtitle_index][1],
-                    script_lines[script_index],
-                )
-            )
-            subtitle_index += 1
-        else:
-            new_subtitle_items.append(
-                (
-                    len(new_subtitle_items) + 1,
-                    "00:00:00,000 --> 00:00:00,000",
-                    script_lines[script_index],
-                )
-            )
-        script_index += 1
-        corrected = True
-
-    if corrected:
-        with open(subtitle_file, "w", encoding="utf-8") as fd:
-            for i, item in enumerate(new_subtitle_items):
-                fd.write(f"{i + 1}\n{item[1]}\n{item[2]}\n\n")
-        logger.info("Subtitle corrected")
-    else:
-        logger.success("Subtitle is correct")
+    aligned = alignment.align_transcript(script_lines, words)
+    if not aligned:
+        logger.warning(f"failed to align the script to the subtitle: {subtitle_file}")
+        return None
+
+    cues = Cues.from_items(aligned)
+    cues.write(subtitle_file)
+    logger.info("Subtitle corrected")
+    return cues
 
 
 if __name__ == "__main__":
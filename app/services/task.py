@@ -7,9 +7,11 @@ from loguru import logger
 
 from app.config import config
 from app.models import const
+from app.models.cues import Cues
 from app.models.schema import VideoConcatMode, VideoParams
-from app.services import llm, material, subtitle, video, voice
+from app.services import alignment, cache_manager, llm, material, subtitle, video, voice
 from app.services import state as sm
+from app.services.utils import media_probe
 from app.utils import utils
 
 
@@ -105,39 +107,72 @@ def generate_audio(task_id, params, video_script):
         logger.error(f"Audio file was not created or is empty: {audio_file}")
         return None, None, None
 
-    audio_duration = math.ceil(voice.get_audio_duration(sub_maker))
+    audio_duration = media_probe.audio_duration(audio_file)
+    if not audio_duration:
+        audio_duration = voice.get_audio_duration(sub_maker)
+    audio_duration = math.ceil(audio_duration)
     logger.info(f"Audio generated successfully: {audio_file} (duration: {audio_duration}s)")
     return audio_file, audio_duration, sub_maker
 
 
 def generate_subtitle(task_id, params, video_script, sub_maker, audio_file):
+    """
+    Returns (subtitle_path, cues), the cues are passed on in memory and the
+    srt file is kept as an artifact of the task
+    """
     if not params.subtitle_enabled:
-        return ""
+        return "", None
 
     subtitle_path = path.join(utils.task_dir(task_id), "subtitle.srt")
     subtitle_provider = config.app.get("subtitle_provider", "edge").strip().lower()
     logger.info(f"\n\n## generating subtitle, provider: {subtitle_provider}")
 
+    cues = None
     subtitle_fallback = False
     if subtitle_provider == "edge":
-        voice.create_subtitle(
+        cues = voice.create_subtitle(
             text=video_script, sub_maker=sub_maker, subtitle_file=subtitle_path
         )
-        if not os.path.exists(subtitle_path):
+        if not cues:
+            if config.app.get("subtitle_alignment_fallback", True):
+                logger.warning("subtitle file not found, fallback to audio alignment")
+                cues = alignment.create_subtitle(
+                    audio_file=audio_file, text=video_script, subtitle_file=subtitle_path
+                )
+        if not cues:
             subtitle_fallback = True
             logger.warning("subtitle file not found, fallback to whisper")
 
+    if subtitle_provider == "vad":
+        # the script is known, only its timing is needed: speech regions from
+        # the VAD, no speech recognition
+        cues = alignment.create_subtitle(
+            audio_file=audio_file,
+            text=video_script,
+            subtitle_file=subtitle_path,
+            method="vad",
+        )
+        if not cues:
+            subtitle_fallback = True
+            logger.warning("vad alignment failed, fallback to whisper")
+
     if subtitle_provider == "whisper" or subtitle_fallback:
-        subtitle.create(audio_file=audio_file, subtitle_file=subtitle_path)
+        segments = subtitle.create(audio_file=audio_file, subtitle_file=subtitle_path)
         logger.info("\n\n## correcting subtitle")
-        subtitle.correct(subtitle_file=subtitle_path, video_script=video_script)
+        cues = subtitle.correct(
+            subtitle_file=subtitle_path,
+            video_script=video_script,
+            audio_file=audio_file,
+            segments=segments,
+        )
+        if not cues and os.path.isfile(subtitle_path):
+            cues = Cues.from_file(subtitle_path)
 
-    subtitle_lines = subtitle.file_to_subtitles(subtitle_path)
-    if not subtitle_lines:
+    if not cues:
         logger.warning(f"subtitle file is invalid: {subtitle_path}")
-        return ""
+        return "", None
 
-    return subtitle_path
+    return subtitle_path, cues
 
 
 def get_video_materials(task_id, params, video_terms, audio_duration):
@@ -160,7 +195,12 @@ def get_video_materials(task_id, params, video_terms, audio_duration):
             search_terms=video_terms,
             source=params.video_source,
             video_aspect=params.video_aspect,
-            video_contact_mode=params.video_concat_mode,
+            # several videos are always combined in random order
+            video_contact_mode=(
+                params.video_concat_mode
+                if params.video_count == 1
+                else VideoConcatMode.random
+            ),
             audio_duration=audio_duration * params.video_count,
             max_clip_duration=params.video_clip_duration,
         )
@@ -174,7 +214,7 @@ def get_video_materials(task_id, params, video_terms, audio_duration):
 
 
 def generate_final_videos(
-    task_id, params, downloaded_videos, audio_file, subtitle_path
+    task_id, params, downloaded_videos, audio_file, subtitle_path, cues=None
 ):
     final_video_paths = []
     combined_video_paths = []
@@ -213,6 +253,7 @@ def generate_final_videos(
             subtitle_path=subtitle_path,
             output_file=final_video_path,
             params=params,
+            cues=cues,
         )
 
         _progress += 50 / params.video_count / 2
@@ -283,7 +324,7 @@ def start(task_id, params: VideoParams, stop_at: str = "video"):
         return {"audio_file": audio_file, "audio_duration": audio_duration}
 
     # 4. Generate subtitle
-    subtitle_path = generate_subtitle(
+    subtitle_path, cues = generate_subtitle(
         task_id, params, video_script, sub_maker, audio_file
     )
 
@@ -299,28 +340,33 @@ def start(task_id, params: VideoParams, stop_at: str = "video"):
     sm.state.update_task(task_id, state=const.TASK_STATE_PROCESSING, progress=40)
 
     # 5. Get video materials
-    downloaded_videos = get_video_materials(
-        task_id, params, video_terms, audio_duration
-    )
-    if not downloaded_videos:
-        sm.state.update_task(task_id, state=const.TASK_STATE_FAILED)
-        return
-
-    if stop_at == "materials":
-        sm.state.update_task(
-            task_id,
-            state=const.TASK_STATE_COMPLETE,
-            progress=100,
-            materials=downloaded_videos,
+    # download_videos pins the materials it selects so they are not evicted
+    # from the cache while downloading and rendering, until the task ends
+    try:
+        downloaded_videos = get_video_materials(
+            task_id, params, video_terms, audio_duration
         )
-        return {"materials": downloaded_videos}
+        if not downloaded_videos:
+            sm.state.update_task(task_id, state=const.TASK_STATE_FAILED)
+            return
 
-    sm.state.update_task(task_id, state=const.TASK_STATE_PROCESSING, progress=50)
+        if stop_at == "materials":
+            sm.state.update_task(
+                task_id,
+                state=const.TASK_STATE_COMPLETE,
+                progress=100,
+                materials=downloaded_videos,
+            )
+            return {"materials": downloaded_videos}
 
-    # 6. Generate final videos
-    final_video_paths, combined_video_paths = generate_final_videos(
-        task_id, params, downloaded_videos, audio_file, subtitle_path
-    )
+        sm.state.update_task(task_id, state=const.TASK_STATE_PROCESSING, progress=50)
+
+        # 6. Generate final videos
+        final_video_paths, combined_video_paths = generate_final_videos(
+            task_id, params, downloaded_videos, audio_file, subtitle_path, cues
+        )
+    finally:
+        cache_manager.manager.unpin_task(task_id)
 
     if not final_video_paths:
         sm.state.update_task(task_id, state=const.TASK_STATE_FAILED)
@@ -0,0 +1,81 @@
+"""
+Persistent cache of Whisper transcriptions.
+
+Retried tasks, re-renders in another aspect and runs with stop_at="subtitle"
+transcribe the very same narration again. The recognized word-level segments
+are stored under storage/cache_transcripts, keyed by the sha256 of the audio
+content and every setting that changes the recognition result.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Optional
+
+from loguru import logger
+
+from app.utils import utils
+
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(audio_file: str, **params) -> str:
+    """
+    Key of a transcription: audio content hash + recognition parameters
+    """
+    settings = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(
+        f"{file_sha256(audio_file)}|{settings}".encode("utf-8")
+    ).hexdigest()
+
+
+def _cache_file(key: str) -> str:
+    directory = utils.storage_dir("cache_transcripts")
+    # concurrent tasks may create the directory at the same time
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{key}.json")
+
+
+def load(key: str) -> Optional[dict]:
+    cache_file = _cache_file(key)
+    if not os.path.isfile(cache_file):
+        return None
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"invalid transcript cache: {cache_file} => {str(e)}")
+        return None
+
+
+def save(key: str, data: dict):
+    cache_file = _cache_file(key)
+    # write to a temporary file first, a crash must not leave a truncated
+    # entry. Every writer has its own, tasks may save the same key at once.
+    tmp_file = ""
+    try:
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=os.path.dirname(cache_file),
+            prefix=f"{key}.",
+            suffix=".tmp",
+            delete=False,
+        ) as f:
+            tmp_file = f.name
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        logger.warning(f"failed to save transcript cache: {cache_file} => {str(e)}")
+        if tmp_file and os.path.exists(tmp_file):
+            os.remove(tmp_file)
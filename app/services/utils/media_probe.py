@@ -0,0 +1,717 @@
+"""
+Lightweight media probing from container / frame headers.
+
+Reading a duration through moviepy spawns an ffmpeg reader process, which is
+far more expensive than the few header bytes needed to answer the question.
+Results are memoized in a shared probe cache keyed by (path, size, mtime).
+"""
+
+import math
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from loguru import logger
+
+
+class AudioInfo(NamedTuple):
+    format: str
+    duration: float
+    sample_rate: int
+    channels: int
+
+
+class VideoInfo(NamedTuple):
+    format: str
+    duration: float
+    width: int
+    height: int
+    fps: float
+
+
+_cache_lock = threading.Lock()
+_cache: "OrderedDict[tuple, object]" = OrderedDict()
+_cache_size = 1024
+
+
+def _cache_key(kind: str, path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return kind, os.path.realpath(path), st.st_size, st.st_mtime_ns
+
+
+def _cache_get(key):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    return None
+
+
+def _cache_put(key, value):
+    with _cache_lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > _cache_size:
+            _cache.popitem(last=False)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+########################################################################
+# MP3
+########################################################################
+
+# bitrate (kbps) tables indexed by [version_group][layer][bitrate_index]
+# version_group: 0 = MPEG1, 1 = MPEG2 / MPEG2.5
+_MP3_BITRATES = {
+    (0, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (0, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (0, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (1, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (1, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (1, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# sample rates indexed by version bits (0 = MPEG2.5, 2 = MPEG2, 3 = MPEG1)
+_MP3_SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000],
+}
+
+
+class _Mp3Frame(NamedTuple):
+    version: int
+    layer: int
+    sample_rate: int
+    channels: int
+    samples: int
+    length: int
+
+
+def _parse_mp3_header(h: bytes) -> Optional[_Mp3Frame]:
+    if len(h) < 4 or h[0] != 0xFF or (h[1] & 0xE0) != 0xE0:
+        return None
+    version = (h[1] >> 3) & 0x03
+    layer_bits = (h[1] >> 1) & 0x03
+    bitrate_index = h[2] >> 4
+    sample_rate_index = (h[2] >> 2) & 0x03
+    if version == 1 or layer_bits == 0:
+        return None
+    if bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    # layer bits: 3 = Layer I, 2 = Layer II, 1 = Layer III
+    layer = 4 - layer_bits
+    group = 0 if version == 3 else 1
+    bitrate = _MP3_BITRATES[(group, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (h[2] >> 1) & 0x01
+    channels = 1 if (h[3] >> 6) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or group == 0:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+    if length < 4:
+        return None
+    return _Mp3Frame(version, layer, sample_rate, channels, samples, length)
+
+
+def _skip_id3v2(f) -> int:
+    f.seek(0)
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b"ID3":
+        size = (
+            (header[6] & 0x7F) << 21
+            | (header[7] & 0x7F) << 14
+            | (header[8] & 0x7F) << 7
+            | (header[9] & 0x7F)
+        )
+        footer = 10 if header[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _find_mp3_frame(f, offset: int, limit: int = 64 * 1024):
+    """
+    Find the first frame whose successor is also a valid frame header,
+    which avoids false syncs inside padding or cover art.
+    """
+    f.seek(offset)
+    buf = f.read(limit)
+    i = buf.find(b"\xff")
+    while 0 <= i < len(buf) - 4:
+        frame = _parse_mp3_header(buf[i : i + 4])
+        if frame:
+            f.seek(offset + i + frame.length)
+            nxt = _parse_mp3_header(f.read(4))
+            if nxt and nxt.sample_rate == frame.sample_rate:
+                return offset + i, frame
+        i = buf.find(b"\xff", i + 1)
+    return None, None
+
+
+def _probe_mp3(f, file_size: int) -> Optional[AudioInfo]:
+    start, frame = _find_mp3_frame(f, _skip_id3v2(f))
+    if frame is None:
+        return None
+
+    f.seek(start)
+    first = f.read(frame.length)
+    # the Xing/Info tag follows the side information of the first frame
+    if frame.version == 3:
+        side_info = 17 if frame.channels == 1 else 32
+    else:
+        side_info = 9 if frame.channels == 1 else 17
+    xing = 4 + side_info
+    if first[xing : xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", first[xing + 4 : xing + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", first[xing + 8 : xing + 12])[0]
+            duration = frames * frame.samples / frame.sample_rate
+            return AudioInfo("mp3", duration, frame.sample_rate, frame.channels)
+    # VBRI tag is always 32 bytes after the frame header
+    if first[36:40] == b"VBRI":
+        frames = struct.unpack(">I", first[50:54])[0]
+        duration = frames * frame.samples / frame.sample_rate
+        return AudioInfo("mp3", duration, frame.sample_rate, frame.channels)
+
+    # no VBR header, walk the frame headers
+    frames = 0
+    offset = start
+    while offset + 4 <= file_size:
+        f.seek(offset)
+        h = _parse_mp3_header(f.read(4))
+        if not h:
+            break
+        frames += 1
+        offset += h.length
+    duration = frames * frame.samples / frame.sample_rate
+    return AudioInfo("mp3", duration, frame.sample_rate, frame.channels)
+
+
+########################################################################
+# WAV
+########################################################################
+
+
+def _probe_wav(f) -> Optional[AudioInfo]:
+    f.seek(0)
+    header = f.read(12)
+    if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    channels = sample_rate = byte_rate = 0
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            _, channels, sample_rate, byte_rate = struct.unpack("<HHII", fmt[:12])
+            f.seek(chunk_size & 1, os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            return AudioInfo("wav", chunk_size / byte_rate, sample_rate, channels)
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+########################################################################
+# AAC (ADTS)
+########################################################################
+
+_AAC_SAMPLE_RATES = [
+    96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050,
+    16000, 12000, 11025, 8000, 7350,
+]
+
+
+def _probe_adts(f, file_size: int) -> Optional[AudioInfo]:
+    offset = _skip_id3v2(f)
+    samples = frames = 0
+    sample_rate = channels = 0
+    while offset + 7 <= file_size:
+        f.seek(offset)
+        h = f.read(7)
+        if h[0] != 0xFF or (h[1] & 0xF6) != 0xF0:
+            break
+        sr_index = (h[2] >> 2) & 0x0F
+        if sr_index >= len(_AAC_SAMPLE_RATES):
+            break
+        sample_rate = _AAC_SAMPLE_RATES[sr_index]
+        channels = ((h[2] & 0x01) << 2) | (h[3] >> 6)
+        length = ((h[3] & 0x03) << 11) | (h[4] << 3) | (h[5] >> 5)
+        if length < 7:
+            break
+        samples += 1024 * ((h[6] & 0x03) + 1)
+        frames += 1
+        offset += length
+    if not frames:
+        return None
+    return AudioInfo("aac", samples / sample_rate, sample_rate, channels)
+
+
+def probe_audio(path: str) -> Optional[AudioInfo]:
+    """
+    Read duration and sample rate of an MP3 / WAV / AAC(ADTS) file from its headers.
+    Returns None if the format is not recognized.
+    """
+    key = _cache_key("audio", path)
+    if key is None:
+        return None
+    info = _cache_get(key)
+    if info is not None:
+        return info
+
+    file_size = key[2]
+    try:
+        with open(path, "rb") as f:
+            head = f.read(4)
+            if head == b"RIFF":
+                info = _probe_wav(f)
+            elif len(head) > 1 and head[0] == 0xFF and (head[1] & 0xF6) == 0xF0:
+                info = _probe_adts(f, file_size)
+            else:
+                info = _probe_mp3(f, file_size)
+                if info is None:
+                    info = _probe_adts(f, file_size)
+    except Exception as e:
+        logger.warning(f"failed to probe audio: {path} => {str(e)}")
+        info = None
+
+    if info is not None:
+        _cache_put(key, info)
+    return info
+
+
+def audio_duration(path: str) -> float:
+    """
+    Duration of an audio file in seconds.
+
+    Uses header probing, and only falls back to decoding with moviepy for
+    formats the probe does not understand.
+    """
+    info = probe_audio(path)
+    if info is not None:
+        return info.duration
+
+    key = _cache_key("audio", path)
+    if key is None:
+        return 0.0
+
+    from moviepy import AudioFileClip
+
+    logger.debug(f"unknown audio format, fallback to ffmpeg: {path}")
+    clip = AudioFileClip(path)
+    try:
+        info = AudioInfo("ffmpeg", clip.duration, clip.fps, clip.nchannels)
+    finally:
+        clip.close()
+    _cache_put(key, info)
+    return info.duration
+
+
+########################################################################
+# MP4
+########################################################################
+
+
+def mp4_box_header(h: bytes):
+    """
+    (type, header_size, box_size) of the box starting at h, box_size is 0
+    when the box extends to the end of the file
+    """
+    if len(h) < 8:
+        return None
+    size, box_type = struct.unpack(">I4s", h[:8])
+    header_size = 8
+    if size == 1:
+        if len(h) < 16:
+            return None
+        size = struct.unpack(">Q", h[8:16])[0]
+        header_size = 16
+    elif size != 0 and size < 8:
+        return None
+    return box_type.decode("latin-1"), header_size, size
+
+
+def _mp4_children(buf: bytes, start: int, end: int) -> dict:
+    """
+    {type: [(payload_start, box_end)]} of the boxes in buf[start:end]
+    """
+    children = {}
+    offset = start
+    while offset + 8 <= end:
+        header = mp4_box_header(buf[offset : offset + 16])
+        if header is None:
+            break
+        box_type, header_size, size = header
+        box_end = end if size == 0 else offset + size
+        if box_end > end:
+            break
+        children.setdefault(box_type, []).append((offset + header_size, box_end))
+        offset = box_end
+    return children
+
+
+def _mp4_child(buf: bytes, parent: tuple, *path: str):
+    for box_type in path:
+        boxes = _mp4_children(buf, *parent).get(box_type)
+        if not boxes:
+            return None
+        parent = boxes[0]
+    return parent
+
+
+def _mp4_track_prefix_end(buf: bytes, trak: tuple, seconds: float) -> Optional[int]:
+    mdia = _mp4_child(buf, trak, "mdia")
+    mdhd = _mp4_child(buf, mdia, "mdhd") if mdia else None
+    stbl = _mp4_child(buf, mdia, "minf", "stbl") if mdia else None
+    if mdhd is None or stbl is None:
+        return None
+    version = buf[mdhd[0]]
+    timescale_at = mdhd[0] + (20 if version == 1 else 12)
+    timescale = struct.unpack_from(">I", buf, timescale_at)[0]
+    if not timescale:
+        return None
+
+    tables = _mp4_children(buf, *stbl)
+    if "stts" not in tables or "stsc" not in tables or "stsz" not in tables:
+        return None
+
+    # samples that start before the end of the window
+    start, _ = tables["stts"][0]
+    count = struct.unpack_from(">I", buf, start + 4)[0]
+    limit = seconds * timescale
+    samples = 0
+    t = 0
+    for i in range(count):
+        n, delta = struct.unpack_from(">II", buf, start + 8 + i * 8)
+        if delta and t + n * delta >= limit:
+            samples += math.ceil((limit - t) / delta)
+            break
+        samples += n
+        t += n * delta
+    if samples <= 0:
+        return 0
+    last = samples - 1
+
+    start, _ = tables["stsz"][0]
+    uniform_size, sample_count = struct.unpack_from(">II", buf, start + 4)
+    last = min(last, sample_count - 1)
+    if uniform_size:
+        sizes = None
+    else:
+        sizes = struct.unpack_from(f">{sample_count}I", buf, start + 12)
+
+    if "stco" in tables:
+        start, _ = tables["stco"][0]
+        n = struct.unpack_from(">I", buf, start + 4)[0]
+        chunk_offsets = struct.unpack_from(f">{n}I", buf, start + 8)
+    elif "co64" in tables:
+        start, _ = tables["co64"][0]
+        n = struct.unpack_from(">I", buf, start + 4)[0]
+        chunk_offsets = struct.unpack_from(f">{n}Q", buf, start + 8)
+    else:
+        return None
+
+    # find the chunk of the last sample: stsc runs of (first chunk, samples per chunk)
+    start, _ = tables["stsc"][0]
+    n = struct.unpack_from(">I", buf, start + 4)[0]
+    runs = [struct.unpack_from(">II", buf, start + 8 + i * 12) for i in range(n)]
+    first_sample = 0
+    for i, (first_chunk, per_chunk) in enumerate(runs):
+        next_chunk = runs[i + 1][0] if i + 1 < len(runs) else len(chunk_offsets) + 1
+        run_samples = (next_chunk - first_chunk) * per_chunk
+        if per_chunk and last < first_sample + run_samples:
+            chunk = first_chunk - 1 + (last - first_sample) // per_chunk
+            chunk_first_sample = last - (last - first_sample) % per_chunk
+            break
+        first_sample += run_samples
+    else:
+        return None
+    if chunk >= len(chunk_offsets):
+        return None
+
+    if sizes is None:
+        used = (last - chunk_first_sample + 1) * uniform_size
+    else:
+        used = sum(sizes[chunk_first_sample : last + 1])
+    return chunk_offsets[chunk] + used
+
+
+def mp4_prefix_end(moov: bytes, seconds: float) -> Optional[int]:
+    """
+    File offset up to which the samples of the first `seconds` of every track
+    are stored, read from the sample tables of a "moov" box (header included).
+    Returns None if the tables are not understood (e.g. fragmented files).
+    """
+    header = mp4_box_header(moov[:16])
+    if header is None or header[0] != "moov":
+        return None
+    try:
+        traks = _mp4_children(moov, header[1], len(moov)).get("trak", [])
+        ends = [_mp4_track_prefix_end(moov, trak, seconds) for trak in traks]
+    except struct.error:
+        return None
+    if not ends or any(end is None for end in ends):
+        return None
+    return max(ends)
+
+
+def _mp4_video_track(buf: bytes, trak: tuple) -> Optional[tuple]:
+    """
+    (width, height, fps) of a video track, None for other tracks
+    """
+    mdia = _mp4_child(buf, trak, "mdia")
+    hdlr = _mp4_child(buf, mdia, "hdlr") if mdia else None
+    if hdlr is None or buf[hdlr[0] + 8 : hdlr[0] + 12] != b"vide":
+        return None
+    tkhd = _mp4_child(buf, trak, "tkhd")
+    mdhd = _mp4_child(buf, mdia, "mdhd")
+    stts = _mp4_child(buf, mdia, "minf", "stbl", "stts")
+    if tkhd is None or mdhd is None:
+        return None
+
+    # 16.16 fixed point, the display size before the transformation matrix
+    width, height = struct.unpack_from(">II", buf, tkhd[1] - 8)
+    width, height = width >> 16, height >> 16
+    matrix_at = tkhd[0] + (52 if buf[tkhd[0]] == 1 else 40)
+    a, b = struct.unpack_from(">ii", buf, matrix_at)
+    if a == 0 and b != 0:
+        # rotated by 90 / 270 degrees, players (and ffmpeg) swap the size
+        width, height = height, width
+
+    if buf[mdhd[0]] == 1:
+        timescale, duration = struct.unpack_from(">IQ", buf, mdhd[0] + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", buf, mdhd[0] + 12)
+    fps = 0.0
+    if stts is not None and timescale and duration:
+        count = struct.unpack_from(">I", buf, stts[0] + 4)[0]
+        samples = sum(
+            struct.unpack_from(">I", buf, stts[0] + 8 + i * 8)[0] for i in range(count)
+        )
+        fps = samples * timescale / duration
+    return width, height, fps
+
+
+def _probe_mp4(f, file_size: int) -> Optional[VideoInfo]:
+    moov = None
+    has_mdat = False
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = mp4_box_header(f.read(16))
+        if header is None:
+            return None
+        box_type, _, size = header
+        if size == 0:
+            size = file_size - offset
+        if offset + size > file_size:
+            # truncated download
+            return None
+        if box_type == "moov":
+            f.seek(offset)
+            moov = f.read(size)
+        elif box_type == "mdat":
+            has_mdat = True
+        offset += size
+    # a tail shorter than a box header after the last box is ignored, players do
+    if moov is None or not has_mdat:
+        return None
+
+    header = mp4_box_header(moov[:16])
+    root = (header[1], len(moov))
+    mvhd = _mp4_child(moov, root, "mvhd")
+    if mvhd is None:
+        return None
+    if moov[mvhd[0]] == 1:
+        timescale, duration = struct.unpack_from(">IQ", moov, mvhd[0] + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", moov, mvhd[0] + 12)
+    if not timescale:
+        return None
+
+    for trak in _mp4_children(moov, *root).get("trak", []):
+        track = _mp4_video_track(moov, trak)
+        if track is not None:
+            return VideoInfo("mp4", duration / timescale, *track)
+    return None
+
+
+########################################################################
+# WebM / Matroska
+########################################################################
+
+_EBML_HEADER = 0x1A45DFA3
+_MKV_SEGMENT = 0x18538067
+_MKV_INFO = 0x1549A966
+_MKV_TIMECODE_SCALE = 0x2AD7B1
+_MKV_DURATION = 0x4489
+_MKV_TRACKS = 0x1654AE6B
+_MKV_TRACK_ENTRY = 0xAE
+_MKV_TRACK_TYPE = 0x83
+_MKV_DEFAULT_DURATION = 0x23E383
+_MKV_VIDEO = 0xE0
+_MKV_PIXEL_WIDTH = 0xB0
+_MKV_PIXEL_HEIGHT = 0xBA
+_MKV_CLUSTER = 0x1F43B675
+
+
+def _ebml_vint(buf: bytes, pos: int, keep_marker: bool):
+    """
+    (value, length) of the variable size integer at pos, value is None for
+    the reserved "unknown size"
+    """
+    first = buf[pos]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8 or pos + length > len(buf):
+        raise ValueError("invalid EBML integer")
+    value = first if keep_marker else first & (0xFF >> length)
+    for b in buf[pos + 1 : pos + length]:
+        value = (value << 8) | b
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = None
+    return value, length
+
+
+def _ebml_elements(buf: bytes, start: int, end: int):
+    """
+    (id, payload_start, payload_end) of the elements in buf[start:end], the
+    end of an element may lie past the end of buf
+    """
+    pos = start
+    while pos < min(end, len(buf)):
+        element_id, n = _ebml_vint(buf, pos, True)
+        size, m = _ebml_vint(buf, pos + n, False)
+        payload = pos + n + m
+        payload_end = end if size is None else payload + size
+        yield element_id, payload, payload_end
+        pos = payload_end
+
+
+def _ebml_uint(buf: bytes, start: int, end: int) -> int:
+    return int.from_bytes(buf[start:end], "big")
+
+
+def _probe_webm(f, file_size: int) -> Optional[VideoInfo]:
+    # the headers come before the first cluster, which is usually within
+    # the first kilobytes
+    f.seek(0)
+    buf = f.read(min(file_size, 1024 * 1024))
+    elements = _ebml_elements(buf, 0, file_size)
+    if next(elements)[0] != _EBML_HEADER:
+        return None
+    element_id, segment, segment_end = next(elements)
+    if element_id != _MKV_SEGMENT:
+        return None
+    if segment_end > file_size:
+        # truncated download
+        return None
+
+    timecode_scale = 1000000
+    duration = 0.0
+    video = None
+    for element_id, start, end in _ebml_elements(buf, segment, segment_end):
+        if element_id == _MKV_INFO:
+            for child_id, a, b in _ebml_elements(buf, start, end):
+                if child_id == _MKV_TIMECODE_SCALE:
+                    timecode_scale = _ebml_uint(buf, a, b)
+                elif child_id == _MKV_DURATION:
+                    duration = struct.unpack(">f" if b - a == 4 else ">d", buf[a:b])[0]
+        elif element_id == _MKV_TRACKS:
+            for entry_id, a, b in _ebml_elements(buf, start, end):
+                if entry_id != _MKV_TRACK_ENTRY:
+                    continue
+                track = {}
+                for child_id, c, d in _ebml_elements(buf, a, b):
+                    if child_id == _MKV_VIDEO:
+                        for video_id, e, g in _ebml_elements(buf, c, d):
+                            track[video_id] = _ebml_uint(buf, e, g)
+                    elif child_id in (_MKV_TRACK_TYPE, _MKV_DEFAULT_DURATION):
+                        track[child_id] = _ebml_uint(buf, c, d)
+                if track.get(_MKV_TRACK_TYPE) == 1 and video is None:
+                    video = track
+        elif element_id == _MKV_CLUSTER:
+            break
+        if end >= len(buf):
+            break
+    if video is None:
+        return None
+
+    frame_duration = video.get(_MKV_DEFAULT_DURATION, 0)
+    return VideoInfo(
+        "webm",
+        duration * timecode_scale / 1e9,
+        video.get(_MKV_PIXEL_WIDTH, 0),
+        video.get(_MKV_PIXEL_HEIGHT, 0),
+        1e9 / frame_duration if frame_duration else 0.0,
+    )
+
+
+def video_format(path: str) -> str:
+    """
+    "mp4" or "webm" when the file starts like one of these containers
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(12)
+    except OSError:
+        return ""
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+        return "mp4"
+    return ""
+
+
+def probe_video(path: str) -> Optional[VideoInfo]:
+    """
+    Read duration, resolution and frame rate of an MP4 / WebM file from its
+    container headers. Returns None if the format is not recognized, the file
+    is truncated or has no video track, or the headers do not tell the
+    duration or size (fragmented MP4, WebM written by a live recorder). The
+    frame rate is 0 when the headers do not tell it.
+    """
+    key = _cache_key("video", path)
+    if key is None:
+        return None
+    info = _cache_get(key)
+    if info is not None:
+        return info
+
+    file_size = key[2]
+    try:
+        with open(path, "rb") as f:
+            fmt = video_format(path)
+            if fmt == "mp4":
+                info = _probe_mp4(f, file_size)
+            elif fmt == "webm":
+                info = _probe_webm(f, file_size)
+    except Exception as e:
+        logger.warning(f"failed to probe video: {path} => {str(e)}")
+        info = None
+
+    if info is None or info.duration <= 0 or info.width <= 0 or info.height <= 0:
+        return None
+    _cache_put(key, info)
+    return info
@@ -4,6 +4,7 @@ import os
 import random
 import gc
 import shutil
+import subprocess
 from typing import List
 from loguru import logger
 from moviepy import (
@@ -17,18 +18,19 @@ from moviepy import (
     afx,
     concatenate_videoclips,
 )
-from moviepy.video.tools.subtitles import SubtitlesClip
 from PIL import ImageFont
 
 from app.models import const
+from app.models.cues import Cues
 from app.models.schema import (
     MaterialInfo,
+    SubtitleMode,
     VideoAspect,
     VideoConcatMode,
     VideoParams,
     VideoTransitionMode,
 )
-from app.services.utils import video_effects
+from app.services.utils import media_probe, video_effects
 from app.utils import utils
 
 class SubClippedVideoClip:
@@ -160,8 +162,7 @@ def combine_videos(
     max_clip_duration: int = 5,
     threads: int = 2,
 ) -> str:
-    audio_clip = AudioFileClip(audio_file)
-    audio_duration = audio_clip.duration
+    audio_duration = media_probe.audio_duration(audio_file)
     logger.info(f"audio duration: {audio_duration} seconds")
     # Required duration of each clip
     req_dur = audio_duration / len(video_paths)
@@ -176,10 +177,17 @@ def combine_videos(
     subclipped_items = []
     video_duration = 0
     for video_path in video_paths:
-        clip = VideoFileClip(video_path)
-        clip_duration = clip.duration
-        clip_w, clip_h = clip.size
-        close_clip(clip)
+        # None when the headers do not tell duration and size (e.g. a
+        # fragmented MP4), ffmpeg reads them from the stream
+        info = media_probe.probe_video(video_path)
+        if info is not None:
+            clip_duration = info.duration
+            clip_w, clip_h = info.width, info.height
+        else:
+            clip = VideoFileClip(video_path)
+            clip_duration = clip.duration
+            clip_w, clip_h = clip.size
+            close_clip(clip)
         
         start_time = 0
 
@@ -261,6 +269,7 @@ def combine_videos(
     final_clip = concatenate_videoclips(processed_clips, method="compose")
     
     # Add audio
+    audio_clip = AudioFileClip(audio_file)
     final_clip = final_clip.with_audio(audio_clip)
     
     # Write the combined video with enhanced quality settings
@@ -355,6 +364,7 @@ def generate_video(
     subtitle_path: str,
     output_file: str,
     params: VideoParams,
+    cues: Cues = None,
 ):
     aspect = VideoAspect(params.video_aspect)
     video_width, video_height = aspect.to_resolution()
@@ -429,20 +439,16 @@ def generate_video(
         [afx.MultiplyVolume(params.voice_volume)]
     )
 
-    def make_textclip(text):
-        return TextClip(
-            text=text,
-            font=font_path,
-            font_size=params.font_size,
-        )
+    # the cues are normally handed over in memory, the srt file is only
+    # parsed when the video is generated from an existing task
+    if cues is None and subtitle_path and os.path.exists(subtitle_path):
+        cues = Cues.from_file(subtitle_path)
 
-    if subtitle_path and os.path.exists(subtitle_path):
-        sub = SubtitlesClip(
-            subtitles=subtitle_path, encoding="utf-8", make_textclip=make_textclip
-        )
+    subtitle_mode = SubtitleMode(params.subtitle_mode or SubtitleMode.burn.value)
+    if cues and subtitle_mode != SubtitleMode.soft:
         text_clips = []
-        for item in sub.subtitles:
-            clip = create_text_clip(subtitle_item=item)
+        for start, end, text in cues:
+            clip = create_text_clip(subtitle_item=((start, end), text))
             text_clips.append(clip)
         video_clip = CompositeVideoClip([video_clip, *text_clips])
 
@@ -488,6 +494,55 @@ def generate_video(
     video_clip.close()
     del video_clip
 
+    if cues and subtitle_mode != SubtitleMode.burn:
+        attach_soft_subtitles(output_file, cues)
+
+
+def attach_soft_subtitles(video_file: str, cues: Cues):
+    """
+    Write .srt / .vtt sidecar files next to the video and mux the subtitles
+    into it as a mov_text stream. The audio and video streams are copied,
+    nothing is re-encoded.
+    """
+    base = os.path.splitext(video_file)[0]
+    srt_file = f"{base}.srt"
+    cues.write(srt_file)
+    cues.write(f"{base}.vtt")
+
+    from moviepy.config import FFMPEG_BINARY
+
+    muxed_file = f"{base}.muxed{os.path.splitext(video_file)[1]}"
+    cmd = [
+        FFMPEG_BINARY,
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        video_file,
+        "-i",
+        srt_file,
+        "-map",
+        "0",
+        "-map",
+        "1",
+        "-c",
+        "copy",
+        "-c:s",
+        "mov_text",
+        muxed_file,
+    ]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        os.replace(muxed_file, video_file)
+        logger.info(f"soft subtitles muxed: {video_file}")
+    except Exception as e:
+        stderr = getattr(e, "stderr", b"") or b""
+        logger.error(
+            f"failed to mux subtitles, keeping the sidecar files: {str(e)} {stderr.decode(errors='ignore')}"
+        )
+        if os.path.exists(muxed_file):
+            os.remove(muxed_file)
+
 
 def preprocess_video(materials: List[MaterialInfo], clip_duration=4):
     for material in materials:
@@ -0,0 +1,529 @@
+"""
+Voice catalog, built once at import time.
+
+Every voice the app knows about (Azure/Edge neural voices, Azure V2 multilingual
+voices and SiliconFlow voices) is parsed a single time into `Voice` records and
+indexed by display name, locale, gender and provider, so UI listings and voice
+name validation are dict lookups instead of re-parsing on every call.
+"""
+
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+DEFAULT_VOICE = "en-US-JennyNeural"
+
+# preferred fallbacks for locales with many voices
+_PREFERRED_FALLBACKS = {
+    ("en-US", "Female"): "en-US-JennyNeural",
+    ("en-US", "Male"): "en-US-GuyNeural",
+    ("en-US", ""): "en-US-JennyNeural",
+}
+
+PROVIDER_AZURE = "azure"
+PROVIDER_SILICONFLOW = "siliconflow"
+
+
+class Voice(NamedTuple):
+    # name as used by the app, without the gender suffix
+    # e.g. zh-CN-XiaoxiaoNeural, en-US-AvaMultilingualNeural-V2, siliconflow:FunAudioLLM/CosyVoice2-0.5B:alex
+    name: str
+    # name shown in the UI and stored in the config, e.g. zh-CN-XiaoxiaoNeural-Female
+    display: str
+    # name sent to the speech service, e.g. en-US-AvaMultilingualNeural, FunAudioLLM/CosyVoice2-0.5B:alex
+    service_name: str
+    locale: str
+    gender: str
+    provider: str
+    v2: bool = False
+    model: str = ""
+
+
+# <name> <gender>
+_AZURE_VOICES = """
+af-ZA-AdriNeural Female
+af-ZA-WillemNeural Male
+am-ET-AmehaNeural Male
+am-ET-MekdesNeural Female
+ar-AE-FatimaNeural Female
+ar-AE-HamdanNeural Male
+ar-BH-AliNeural Male
+ar-BH-LailaNeural Female
+ar-DZ-AminaNeural Female
+ar-DZ-IsmaelNeural Male
+ar-EG-SalmaNeural Female
+ar-EG-ShakirNeural Male
+ar-IQ-BasselNeural Male
+ar-IQ-RanaNeural Female
+ar-JO-SanaNeural Female
+ar-JO-TaimNeural Male
+ar-KW-FahedNeural Male
+ar-KW-NouraNeural Female
+ar-LB-LaylaNeural Female
+ar-LB-RamiNeural Male
+ar-LY-ImanNeural Female
+ar-LY-OmarNeural Male
+ar-MA-JamalNeural Male
+ar-MA-MounaNeural Female
+ar-OM-AbdullahNeural Male
+ar-OM-AyshaNeural Female
+ar-QA-AmalNeural Female
+ar-QA-MoazNeural Male
+ar-SA-HamedNeural Male
+ar-SA-ZariyahNeural Female
+ar-SY-AmanyNeural Female
+ar-SY-LaithNeural Male
+ar-TN-HediNeural Male
+ar-TN-ReemNeural Female
+ar-YE-MaryamNeural Female
+ar-YE-SalehNeural Male
+az-AZ-BabekNeural Male
+az-AZ-BanuNeural Female
+bg-BG-BorislavNeural Male
+bg-BG-KalinaNeural Female
+bn-BD-NabanitaNeural Female
+bn-BD-PradeepNeural Male
+bn-IN-BashkarNeural Male
+bn-IN-TanishaaNeural Female
+bs-BA-GoranNeural Male
+bs-BA-VesnaNeural Female
+ca-ES-EnricNeural Male
+ca-ES-JoanaNeural Female
+cs-CZ-AntoninNeural Male
+cs-CZ-VlastaNeural Female
+cy-GB-AledNeural Male
+cy-GB-NiaNeural Female
+da-DK-ChristelNeural Female
+da-DK-JeppeNeural Male
+de-AT-IngridNeural Female
+de-AT-JonasNeural Male
+de-CH-JanNeural Male
+de-CH-LeniNeural Female
+de-DE-AmalaNeural Female
+de-DE-ConradNeural Male
+de-DE-FlorianMultilingualNeural Male
+de-DE-KatjaNeural Female
+de-DE-KillianNeural Male
+de-DE-SeraphinaMultilingualNeural Female
+el-GR-AthinaNeural Female
+el-GR-NestorasNeural Male
+en-AU-NatashaNeural Female
+en-AU-WilliamNeural Male
+en-CA-ClaraNeural Female
+en-CA-LiamNeural Male
+en-GB-LibbyNeural Female
+en-GB-MaisieNeural Female
+en-GB-RyanNeural Male
+en-GB-SoniaNeural Female
+en-GB-ThomasNeural Male
+en-HK-SamNeural Male
+en-HK-YanNeural Female
+en-IE-ConnorNeural Male
+en-IE-EmilyNeural Female
+en-IN-NeerjaExpressiveNeural Female
+en-IN-NeerjaNeural Female
+en-IN-PrabhatNeural Male
+en-KE-AsiliaNeural Female
+en-KE-ChilembaNeural Male
+en-NG-AbeoNeural Male
+en-NG-EzinneNeural Female
+en-NZ-MitchellNeural Male
+en-NZ-MollyNeural Female
+en-PH-JamesNeural Male
+en-PH-RosaNeural Female
+en-SG-LunaNeural Female
+en-SG-WayneNeural Male
+en-TZ-ElimuNeural Male
+en-TZ-ImaniNeural Female
+en-US-AnaNeural Female
+en-US-AndrewMultilingualNeural Male
+en-US-AndrewNeural Male
+en-US-AriaNeural Female
+en-US-AvaMultilingualNeural Female
+en-US-AvaNeural Female
+en-US-BrianMultilingualNeural Male
+en-US-BrianNeural Male
+en-US-ChristopherNeural Male
+en-US-EmmaMultilingualNeural Female
+en-US-EmmaNeural Female
+en-US-EricNeural Male
+en-US-GuyNeural Male
+en-US-JennyNeural Female
+en-US-MichelleNeural Female
+en-US-RogerNeural Male
+en-US-SteffanNeural Male
+en-ZA-LeahNeural Female
+en-ZA-LukeNeural Male
+es-AR-ElenaNeural Female
+es-AR-TomasNeural Male
+es-BO-MarceloNeural Male
+es-BO-SofiaNeural Female
+es-CL-CatalinaNeural Female
+es-CL-LorenzoNeural Male
+es-CO-GonzaloNeural Male
+es-CO-SalomeNeural Female
+es-CR-JuanNeural Male
+es-CR-MariaNeural Female
+es-CU-BelkysNeural Female
+es-CU-ManuelNeural Male
+es-DO-EmilioNeural Male
+es-DO-RamonaNeural Female
+es-EC-AndreaNeural Female
+es-EC-LuisNeural Male
+es-ES-AlvaroNeural Male
+es-ES-ElviraNeural Female
+es-ES-XimenaNeural Female
+es-GQ-JavierNeural Male
+es-GQ-TeresaNeural Female
+es-GT-AndresNeural Male
+es-GT-MartaNeural Female
+es-HN-CarlosNeural Male
+es-HN-KarlaNeural Female
+es-MX-DaliaNeural Female
+es-MX-JorgeNeural Male
+es-NI-FedericoNeural Male
+es-NI-YolandaNeural Female
+es-PA-MargaritaNeural Female
+es-PA-RobertoNeural Male
+es-PE-AlexNeural Male
+es-PE-CamilaNeural Female
+es-PR-KarinaNeural Female
+es-PR-VictorNeural Male
+es-PY-MarioNeural Male
+es-PY-TaniaNeural Female
+es-SV-LorenaNeural Female
+es-SV-RodrigoNeural Male
+es-US-AlonsoNeural Male
+es-US-PalomaNeural Female
+es-UY-MateoNeural Male
+es-UY-ValentinaNeural Female
+es-VE-PaolaNeural Female
+es-VE-SebastianNeural Male
+et-EE-AnuNeural Female
+et-EE-KertNeural Male
+fa-IR-DilaraNeural Female
+fa-IR-FaridNeural Male
+fi-FI-HarriNeural Male
+fi-FI-NooraNeural Female
+fil-PH-AngeloNeural Male
+fil-PH-BlessicaNeural Female
+fr-BE-CharlineNeural Female
+fr-BE-GerardNeural Male
+fr-CA-AntoineNeural Male
+fr-CA-JeanNeural Male
+fr-CA-SylvieNeural Female
+fr-CA-ThierryNeural Male
+fr-CH-ArianeNeural Female
+fr-CH-FabriceNeural Male
+fr-FR-DeniseNeural Female
+fr-FR-EloiseNeural Female
+fr-FR-HenriNeural Male
+fr-FR-RemyMultilingualNeural Male
+fr-FR-VivienneMultilingualNeural Female
+ga-IE-ColmNeural Male
+ga-IE-OrlaNeural Female
+gl-ES-RoiNeural Male
+gl-ES-SabelaNeural Female
+gu-IN-DhwaniNeural Female
+gu-IN-NiranjanNeural Male
+he-IL-AvriNeural Male
+he-IL-HilaNeural Female
+hi-IN-MadhurNeural Male
+hi-IN-SwaraNeural Female
+hr-HR-GabrijelaNeural Female
+hr-HR-SreckoNeural Male
+hu-HU-NoemiNeural Female
+hu-HU-TamasNeural Male
+id-ID-ArdiNeural Male
+id-ID-GadisNeural Female
+is-IS-GudrunNeural Female
+is-IS-GunnarNeural Male
+it-IT-DiegoNeural Male
+it-IT-ElsaNeural Female
+it-IT-GiuseppeMultilingualNeural Male
+it-IT-IsabellaNeural Female
+iu-Cans-CA-SiqiniqNeural Female
+iu-Cans-CA-TaqqiqNeural Male
+iu-Latn-CA-SiqiniqNeural Female
+iu-Latn-CA-TaqqiqNeural Male
+ja-JP-KeitaNeural Male
+ja-JP-NanamiNeural Female
+jv-ID-DimasNeural Male
+jv-ID-SitiNeural Female
+ka-GE-EkaNeural Female
+ka-GE-GiorgiNeural Male
+kk-KZ-AigulNeural Female
+kk-KZ-DauletNeural Male
+km-KH-PisethNeural Male
+km-KH-SreymomNeural Female
+kn-IN-GaganNeural Male
+kn-IN-SapnaNeural Female
+ko-KR-HyunsuMultilingualNeural Male
+ko-KR-InJoonNeural Male
+ko-KR-SunHiNeural Female
+lo-LA-ChanthavongNeural Male
+lo-LA-KeomanyNeural Female
+lt-LT-LeonasNeural Male
+lt-LT-OnaNeural Female
+lv-LV-EveritaNeural Female
+lv-LV-NilsNeural Male
+mk-MK-AleksandarNeural Male
+mk-MK-MarijaNeural Female
+ml-IN-MidhunNeural Male
+ml-IN-SobhanaNeural Female
+mn-MN-BataaNeural Male
+mn-MN-YesuiNeural Female
+mr-IN-AarohiNeural Female
+mr-IN-ManoharNeural Male
+ms-MY-OsmanNeural Male
+ms-MY-YasminNeural Female
+mt-MT-GraceNeural Female
+mt-MT-JosephNeural Male
+my-MM-NilarNeural Female
+my-MM-ThihaNeural Male
+nb-NO-FinnNeural Male
+nb-NO-PernilleNeural Female
+ne-NP-HemkalaNeural Female
+ne-NP-SagarNeural Male
+nl-BE-ArnaudNeural Male
+nl-BE-DenaNeural Female
+nl-NL-ColetteNeural Female
+nl-NL-FennaNeural Female
+nl-NL-MaartenNeural Male
+pl-PL-MarekNeural Male
+pl-PL-ZofiaNeural Female
+ps-AF-GulNawazNeural Male
+ps-AF-LatifaNeural Female
+pt-BR-AntonioNeural Male
+pt-BR-FranciscaNeural Female
+pt-BR-ThalitaMultilingualNeural Female
+pt-PT-DuarteNeural Male
+pt-PT-RaquelNeural Female
+ro-RO-AlinaNeural Female
+ro-RO-EmilNeural Male
+ru-RU-DmitryNeural Male
+ru-RU-SvetlanaNeural Female
+si-LK-SameeraNeural Male
+si-LK-ThiliniNeural Female
+sk-SK-LukasNeural Male
+sk-SK-ViktoriaNeural Female
+sl-SI-PetraNeural Female
+sl-SI-RokNeural Male
+so-SO-MuuseNeural Male
+so-SO-UbaxNeural Female
+sq-AL-AnilaNeural Female
+sq-AL-IlirNeural Male
+sr-RS-NicholasNeural Male
+sr-RS-SophieNeural Female
+su-ID-JajangNeural Male
+su-ID-TutiNeural Female
+sv-SE-MattiasNeural Male
+sv-SE-SofieNeural Female
+sw-KE-RafikiNeural Male
+sw-KE-ZuriNeural Female
+sw-TZ-DaudiNeural Male
+sw-TZ-RehemaNeural Female
+ta-IN-PallaviNeural Female
+ta-IN-ValluvarNeural Male
+ta-LK-KumarNeural Male
+ta-LK-SaranyaNeural Female
+ta-MY-KaniNeural Female
+ta-MY-SuryaNeural Male
+ta-SG-AnbuNeural Male
+ta-SG-VenbaNeural Female
+te-IN-MohanNeural Male
+te-IN-ShrutiNeural Female
+th-TH-NiwatNeural Male
+th-TH-PremwadeeNeural Female
+tr-TR-AhmetNeural Male
+tr-TR-EmelNeural Female
+uk-UA-OstapNeural Male
+uk-UA-PolinaNeural Female
+ur-IN-GulNeural Female
+ur-IN-SalmanNeural Male
+ur-PK-AsadNeural Male
+ur-PK-UzmaNeural Female
+uz-UZ-MadinaNeural Female
+uz-UZ-SardorNeural Male
+vi-VN-HoaiMyNeural Female
+vi-VN-NamMinhNeural Male
+zh-CN-XiaoxiaoNeural Female
+zh-CN-XiaoyiNeural Female
+zh-CN-YunjianNeural Male
+zh-CN-YunxiNeural Male
+zh-CN-YunxiaNeural Male
+zh-CN-YunyangNeural Male
+zh-CN-liaoning-XiaobeiNeural Female
+zh-CN-shaanxi-XiaoniNeural Female
+zh-HK-HiuGaaiNeural Female
+zh-HK-HiuMaanNeural Female
+zh-HK-WanLungNeural Male
+zh-TW-HsiaoChenNeural Female
+zh-TW-HsiaoYuNeural Female
+zh-TW-YunJheNeural Male
+zu-ZA-ThandoNeural Female
+zu-ZA-ThembaNeural Male
+en-US-AvaMultilingualNeural-V2 Female
+en-US-AndrewMultilingualNeural-V2 Male
+en-US-EmmaMultilingualNeural-V2 Female
+en-US-BrianMultilingualNeural-V2 Male
+de-DE-FlorianMultilingualNeural-V2 Male
+de-DE-SeraphinaMultilingualNeural-V2 Female
+fr-FR-RemyMultilingualNeural-V2 Male
+fr-FR-VivienneMultilingualNeural-V2 Female
+zh-CN-XiaoxiaoMultilingualNeural-V2 Female
+""".strip()
+
+# <model> <voice> <gender>
+_SILICONFLOW_VOICES = """
+FunAudioLLM/CosyVoice2-0.5B alex Male
+FunAudioLLM/CosyVoice2-0.5B anna Female
+FunAudioLLM/CosyVoice2-0.5B bella Female
+FunAudioLLM/CosyVoice2-0.5B benjamin Male
+FunAudioLLM/CosyVoice2-0.5B charles Male
+FunAudioLLM/CosyVoice2-0.5B claire Female
+FunAudioLLM/CosyVoice2-0.5B david Male
+FunAudioLLM/CosyVoice2-0.5B diana Female
+""".strip()
+
+
+def _build():
+    voices: List[Voice] = []
+    for line in _AZURE_VOICES.splitlines():
+        name, gender = line.split()
+        v2 = name.endswith("-V2")
+        service_name = name[: -len("-V2")] if v2 else name
+        # zh-CN-XiaoxiaoNeural => zh-CN, iu-Cans-CA-SiqiniqNeural => iu-Cans-CA
+        locale = service_name.rsplit("-", 1)[0]
+        voices.append(
+            Voice(
+                name=name,
+                display=f"{name}-{gender}",
+                service_name=service_name,
+                locale=locale,
+                gender=gender,
+                provider=PROVIDER_AZURE,
+                v2=v2,
+            )
+        )
+
+    for line in _SILICONFLOW_VOICES.splitlines():
+        model, voice, gender = line.split()
+        name = f"siliconflow:{model}:{voice}"
+        voices.append(
+            Voice(
+                name=name,
+                display=f"{name}-{gender}",
+                service_name=f"{model}:{voice}",
+                locale="",
+                gender=gender,
+                provider=PROVIDER_SILICONFLOW,
+                model=model,
+            )
+        )
+    return voices
+
+
+_voices = _build()
+
+_by_name: Dict[str, Voice] = {}
+_by_locale: Dict[str, List[Voice]] = {}
+_by_gender: Dict[str, List[Voice]] = {}
+_by_provider: Dict[str, List[Voice]] = {}
+_v2_voices: List[Voice] = []
+
+for _v in _voices:
+    _by_name[_v.name] = _v
+    _by_name[_v.display] = _v
+    if _v.provider == PROVIDER_AZURE and not _v.v2:
+        _by_name.setdefault(_v.service_name, _v)
+    if _v.locale:
+        _by_locale.setdefault(_v.locale.lower(), []).append(_v)
+    _by_gender.setdefault(_v.gender, []).append(_v)
+    _by_provider.setdefault(_v.provider, []).append(_v)
+    if _v.v2:
+        _v2_voices.append(_v)
+
+
+def get(voice_name: str) -> Optional[Voice]:
+    """
+    Look up a voice by display name (with gender), app name or service name
+    """
+    if not voice_name:
+        return None
+    return _by_name.get(voice_name.strip())
+
+
+def is_valid(voice_name: str) -> bool:
+    return get(voice_name) is not None
+
+
+def by_locale(locale: str) -> List[Voice]:
+    return list(_by_locale.get(locale.lower(), []))
+
+
+def by_gender(gender: str) -> List[Voice]:
+    return list(_by_gender.get(gender, []))
+
+
+def by_provider(provider: str) -> List[Voice]:
+    return list(_by_provider.get(provider, []))
+
+
+def v2_voices() -> List[Voice]:
+    return list(_v2_voices)
+
+
+@lru_cache(maxsize=64)
+def _azure_displays(filter_locals: Tuple[str, ...]) -> Tuple[str, ...]:
+    voices = _by_provider[PROVIDER_AZURE]
+    if filter_locals:
+        prefixes = tuple(fl.lower() for fl in filter_locals)
+        voices = [v for v in voices if v.name.lower().startswith(prefixes)]
+    return tuple(sorted(v.display for v in voices))
+
+
+def azure_voices(filter_locals=None) -> List[str]:
+    """
+    Sorted display names of the Azure voices, optionally filtered by locale prefixes
+    """
+    return list(_azure_displays(tuple(filter_locals or ())))
+
+
+def siliconflow_voices() -> List[str]:
+    return [v.display for v in _by_provider[PROVIDER_SILICONFLOW]]
+
+
+def fallback(voice_name: str) -> str:
+    """
+    Pick a known voice close to an unknown one: same locale and gender first,
+    then same locale, then the default voice.
+
+    en-US-DavisNeural-Male => en-US-GuyNeural
+    """
+    name = (voice_name or "").strip()
+    gender = ""
+    for g in ("Female", "Male"):
+        if name.endswith(f"-{g}"):
+            gender = g
+            name = name[: -len(g) - 1]
+            break
+
+    parts = name.split("-")
+    candidates = []
+    # try the longest locale first, e.g. zh-CN-liaoning before zh-CN
+    for i in range(len(parts) - 1, 1, -1):
+        candidates = _by_locale.get("-".join(parts[:i]).lower(), [])
+        if candidates:
+            break
+
+    candidates = [v for v in candidates if not v.v2]
+    if candidates:
+        preferred = _PREFERRED_FALLBACKS.get((candidates[0].locale, gender))
+        if preferred:
+            return preferred
+    if gender:
+        same_gender = [v for v in candidates if v.gender == gender]
+        candidates = same_gender or candidates
+    if candidates:
+        return candidates[0].service_name
+    return DEFAULT_VOICE
@@ -0,0 +1,700 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from timeit import default_timer as timer
+from typing import List, NamedTuple, Tuple
+
+from loguru import logger
+
+from app.config import config
+from app.services import transcript_cache
+from app.services.utils import media_probe
+from app.utils import utils
+
+
+def _rss_bytes() -> int:
+    """
+    Resident memory of the current process, 0 if it can not be determined
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        # getrusage only knows the peak, which is not the current size
+        return 0
+
+
+class ModelManager:
+    """
+    Loads faster-whisper models and hands them out from a fixed size pool.
+
+    A model instance is never shared by two transcriptions at the same time,
+    and at most `pool_size` instances are ever loaded, no matter how many
+    tasks ask for one concurrently.
+    """
+
+    def __init__(
+        self,
+        model_size: str = "large-v3",
+        device: str = "cpu",
+        compute_type: str = "int8",
+        pool_size: int = 1,
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+    ):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.pool_size = max(1, pool_size)
+        self.cpu_threads = cpu_threads
+        self.num_workers = max(1, num_workers)
+
+        # guards the counters and the idle list, waiters are notified when
+        # a model is returned or a load ends, successfully or not
+        self._lock = threading.Condition()
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._load_seconds = []
+        self._warmup_seconds = []
+        self._memory_bytes = []
+        self._last_error = ""
+
+    def model_path(self) -> str:
+        model_path = f"{utils.root_dir()}/models/whisper-{self.model_size}"
+        model_bin_file = f"{model_path}/model.bin"
+        if not os.path.isdir(model_path) or not os.path.isfile(model_bin_file):
+            model_path = self.model_size
+        return model_path
+
+    def _load(self):
+        from faster_whisper import WhisperModel
+
+        model_path = self.model_path()
+        logger.info(
+            f"loading model: {model_path}, device: {self.device}, compute_type: {self.compute_type}, "
+            f"cpu_threads: {self.cpu_threads}, num_workers: {self.num_workers}"
+        )
+        rss = _rss_bytes()
+        start = timer()
+        try:
+            model = WhisperModel(
+                model_size_or_path=model_path,
+                device=self.device,
+                compute_type=self.compute_type,
+                cpu_threads=self.cpu_threads,
+                num_workers=self.num_workers,
+            )
+        except Exception as e:
+            self._last_error = str(e)
+            logger.error(
+                f"failed to load model: {e} \n\n"
+                f"********************************************\n"
+                f"this may be caused by network issue. \n"
+                f"please download the model manually and put it in the 'models' folder. \n"
+                f"see [README.md FAQ](https://github.com/harry0703/MoneyPrinterTurbo) for more details.\n"
+                f"********************************************\n\n"
+            )
+            raise
+        elapsed = timer() - start
+        self._load_seconds.append(round(elapsed, 2))
+        self._memory_bytes.append(max(0, _rss_bytes() - rss))
+        logger.success(f"model loaded: {model_path}, elapsed: {elapsed:.2f} s")
+        return model
+
+    def _warmup(self, model):
+        import numpy as np
+
+        start = timer()
+        segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1)
+        for _ in segments:
+            pass
+        elapsed = timer() - start
+        self._warmup_seconds.append(round(elapsed, 2))
+        logger.info(f"model warmed up, elapsed: {elapsed:.2f} s")
+
+    def _create(self, warmup: bool = False):
+        """
+        Load one more instance if the pool is not full, returns None otherwise
+        """
+        with self._lock:
+            if self._created >= self.pool_size:
+                return None
+            # reserve the slot before loading, so concurrent callers can not
+            # load more instances than the pool size
+            self._created += 1
+        try:
+            model = self._load()
+            if warmup:
+                self._warmup(model)
+            return model
+        except Exception:
+            with self._lock:
+                self._created -= 1
+                # a waiter can now load the instance itself
+                self._lock.notify_all()
+            raise
+
+    def _release(self, model):
+        with self._lock:
+            self._idle.append(model)
+            self._lock.notify_all()
+
+    def preload(self, warmup: bool = True):
+        """
+        Load (and warm up) every instance of the pool ahead of the first request
+        """
+        while True:
+            try:
+                model = self._create(warmup=warmup)
+            except Exception:
+                return
+            if model is None:
+                return
+            self._release(model)
+
+    def _take(self, timeout: float = None):
+        """
+        An idle instance, or a newly loaded one while the pool is not full,
+        or wait for one of these. Raises TimeoutError after timeout seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                while not self._idle and self._created >= self.pool_size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"no whisper model available after {timeout} s")
+                    self._lock.wait(remaining)
+                if self._idle:
+                    model = self._idle.pop()
+                    self._in_use += 1
+                    return model
+            # a free slot, load outside the lock. None when another caller
+            # took the slot in the meantime, then wait again
+            model = self._create()
+            if model is not None:
+                with self._lock:
+                    self._in_use += 1
+                return model
+
+    @contextmanager
+    def acquire(self, timeout: float = None):
+        """
+        Borrow a model instance for the duration of the with-block
+        """
+        model = self._take(timeout)
+        try:
+            yield model
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._release(model)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "model_size": self.model_size,
+                "device": self.device,
+                "compute_type": self.compute_type,
+                "cpu_threads": self.cpu_threads,
+                "num_workers": self.num_workers,
+                "pool_size": self.pool_size,
+                "loaded": self._created,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "load_seconds": list(self._load_seconds),
+                "warmup_seconds": list(self._warmup_seconds),
+                "memory_bytes": list(self._memory_bytes),
+                "process_memory_bytes": _rss_bytes(),
+                "last_error": self._last_error,
+            }
+
+
+manager = ModelManager(
+    model_size=config.whisper.get("model_size", "large-v3"),
+    device=config.whisper.get("device", "cpu"),
+    compute_type=config.whisper.get("compute_type", "int8"),
+    pool_size=int(config.whisper.get("pool_size", 1)),
+    cpu_threads=int(config.whisper.get("cpu_threads", 0)),
+    num_workers=int(config.whisper.get("num_workers", 1)),
+)
+
+
+def preload():
+    if not config.whisper.get("preload", False):
+        return
+    logger.info("preloading whisper model")
+    manager.preload(warmup=config.whisper.get("warmup", True))
+
+
+class Word(NamedTuple):
+    start: float
+    end: float
+    word: str
+
+
+class Segment(NamedTuple):
+    start: float
+    end: float
+    text: str
+    words: List[Word]
+
+
+def _to_segment(segment, shift: float = 0.0) -> Segment:
+    words = [
+        Word(w.start - shift, w.end - shift, w.word) for w in (segment.words or [])
+    ]
+    return Segment(segment.start - shift, segment.end - shift, segment.text, words)
+
+
+SAMPLE_RATE = 16000
+# the batched pipeline feeds the model chunks of at most 30 seconds
+CHUNK_SECONDS = 30
+
+
+class _Request:
+    def __init__(self, audio_file: str):
+        self.audio_file = audio_file
+        self.done = threading.Event()
+        self.segments = None
+        self.language = ""
+        self.language_probability = 0.0
+        self.error = None
+
+    def finish(self, segments=None, language="", probability=0.0, error=None):
+        self.segments = segments
+        self.language = language
+        self.language_probability = probability
+        self.error = error
+        self.done.set()
+
+
+class BatchTranscriber:
+    """
+    Gathers audio files submitted by concurrent tasks and transcribes them
+    together with faster-whisper's batched pipeline.
+
+    Every request waits up to `window_ms` for others to join. The VAD chunks of
+    all audios in a batch are decoded into one sample buffer (separated by a
+    second of silence) and run through a single model instance `batch_size`
+    chunks at a time, instead of N independent beam searches competing for the
+    same CPU. Chunks never cross audio boundaries, so every segment is routed
+    back to the request it came from by its start time.
+    """
+
+    def __init__(
+        self,
+        model_manager: ModelManager,
+        batch_size: int = 8,
+        window_ms: int = 500,
+        max_audios: int = 8,
+        min_silence_duration_ms: int = 500,
+    ):
+        self.manager = model_manager
+        self.batch_size = max(1, batch_size)
+        self.window = max(0, window_ms) / 1000
+        self.max_audios = max(1, max_audios)
+        self.min_silence_duration_ms = min_silence_duration_ms
+
+        self._cond = threading.Condition()
+        self._pending: List[_Request] = []
+        self._worker = None
+
+    def transcribe(self, audio_file: str) -> Tuple[List[Segment], str, float]:
+        request = _Request(audio_file)
+        with self._cond:
+            self._pending.append(request)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="whisper-batch", daemon=True
+                )
+                self._worker.start()
+            self._cond.notify_all()
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.segments, request.language, request.language_probability
+
+    def _next_batch(self) -> List[_Request]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._pending) < self.max_audios:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[: self.max_audios]
+            del self._pending[: self.max_audios]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"batched transcription failed: {str(e)}")
+                for request in batch:
+                    if not request.done.is_set():
+                        request.finish(error=e)
+
+    def _process(self, batch: List[_Request]):
+        from faster_whisper import BatchedInferencePipeline
+        from faster_whisper.audio import decode_audio
+
+        items = []
+        for request in batch:
+            try:
+                audio = decode_audio(request.audio_file, sampling_rate=SAMPLE_RATE)
+            except Exception as e:
+                request.finish(error=e)
+                continue
+            items.append((request, audio))
+        if not items:
+            return
+
+        start = timer()
+        with self.manager.acquire() as model:
+            # the pipeline decodes a whole batch in one language, so audios
+            # are grouped by the language detected on their own speech
+            groups = {}
+            for request, audio in items:
+                language, probability, _ = model.detect_language(
+                    audio, vad_filter=True
+                )
+                groups.setdefault(language, []).append((request, audio, probability))
+
+            pipeline = BatchedInferencePipeline(model)
+            for language, group in groups.items():
+                self._transcribe_group(pipeline, language, group)
+
+        logger.info(
+            f"batched transcription of {len(items)} audio files in {len(groups)} language groups, "
+            f"elapsed: {timer() - start:.2f} s"
+        )
+
+    def _transcribe_group(self, pipeline, language: str, group: list):
+        import numpy as np
+        from faster_whisper.vad import VadOptions, get_speech_timestamps, merge_segments
+
+        vad_options = VadOptions(
+            min_silence_duration_ms=self.min_silence_duration_ms,
+            max_speech_duration_s=CHUNK_SECONDS,
+        )
+        gap = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        buffers = []
+        clips = []
+        starts = []
+        offset = 0
+        for _, audio, _ in group:
+            speech = get_speech_timestamps(audio, vad_options)
+            for chunk in merge_segments(speech, vad_options):
+                clips.append(
+                    {"start": chunk["start"] + offset, "end": chunk["end"] + offset}
+                )
+            starts.append(offset / SAMPLE_RATE)
+            buffers.extend((audio, gap))
+            offset += len(audio) + len(gap)
+
+        routed = [[] for _ in group]
+        if clips:
+            segments, _ = pipeline.transcribe(
+                np.concatenate(buffers),
+                language=language,
+                clip_timestamps=clips,
+                batch_size=self.batch_size,
+                word_timestamps=True,
+            )
+            for segment in segments:
+                idx = max(0, bisect.bisect_right(starts, segment.start) - 1)
+                routed[idx].append(_to_segment(segment, starts[idx]))
+
+        for (request, _, probability), segments in zip(group, routed):
+            request.finish(segments, language, probability)
+
+
+batcher = BatchTranscriber(
+    manager,
+    batch_size=int(config.whisper.get("batch_size", 8)),
+    window_ms=int(config.whisper.get("batch_window_ms", 500)),
+    max_audios=int(config.whisper.get("batch_max_audios", 8)),
+)
+
+
+# VAD settings of the non-batched transcription
+VAD_PARAMETERS = dict(min_silence_duration_ms=500)
+
+
+# model of a parallel transcription worker process
+_worker_model = None
+
+
+def _worker_init(model_path: str, device: str, compute_type: str, cpu_threads: int):
+    global _worker_model
+    from faster_whisper import WhisperModel
+
+    _worker_model = WhisperModel(
+        model_size_or_path=model_path,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+    )
+
+
+def _worker_detect_language(samples):
+    language, probability, _ = _worker_model.detect_language(samples, vad_filter=True)
+    return language, probability
+
+
+def _worker_transcribe(samples, offset: float, language: str):
+    segments, info = _worker_model.transcribe(
+        samples,
+        language=language,
+        beam_size=5,
+        word_timestamps=True,
+        vad_filter=True,
+        vad_parameters=VAD_PARAMETERS,
+    )
+    # shift the chunk's timeline onto the timeline of the whole narration
+    segments = [_to_segment(segment, -offset) for segment in segments]
+    return segments
+
+
+def split_at_silences(samples, parts: int, min_silence_duration_ms: int = 500) -> list:
+    """
+    Cut points (in samples) that split the audio into `parts` chunks of similar
+    length. Every cut lies in the middle of a VAD silence, so no word is split.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    speech = get_speech_timestamps(
+        samples, VadOptions(min_silence_duration_ms=min_silence_duration_ms)
+    )
+    gaps = [
+        (prev["end"] + cur["start"]) // 2 for prev, cur in zip(speech, speech[1:])
+    ]
+    cuts = []
+    for k in range(1, parts):
+        if not gaps:
+            break
+        target = len(samples) * k // parts
+        cut = min(gaps, key=lambda g: abs(g - target))
+        if not cuts or cut > cuts[-1]:
+            cuts.append(cut)
+    return cuts
+
+
+class ParallelTranscriber:
+    """
+    Transcribes long narrations in chunks on a pool of worker processes.
+
+    The audio is cut at VAD silences into one chunk per worker, each worker
+    process holds its own model instance, and the word timestamps of every
+    chunk are shifted by the chunk offset before the segments are merged, so
+    the result lines up with a single pass over the whole file.
+    """
+
+    def __init__(self, model_manager: ModelManager, workers: int, min_duration: float):
+        cores = os.cpu_count() or 1
+        self.manager = model_manager
+        self.workers = max(0, min(workers, cores))
+        self.min_duration = min_duration
+        # silences the audio is cut at, between the chunks of the workers
+        self.min_silence_duration_ms = 500
+        # split the cores between the workers, unless configured explicitly
+        self.cpu_threads = model_manager.cpu_threads or max(1, cores // max(1, self.workers))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def enabled_for(self, duration: float) -> bool:
+        return self.workers > 1 and duration >= self.min_duration
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                logger.info(
+                    f"starting {self.workers} whisper worker processes, cpu_threads: {self.cpu_threads}"
+                )
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # ctranslate2 is not fork safe once a model is loaded
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_worker_init,
+                    initargs=(
+                        self.manager.model_path(),
+                        self.manager.device,
+                        self.manager.compute_type,
+                        self.cpu_threads,
+                    ),
+                )
+            return self._executor
+
+    def transcribe(self, audio_file: str) -> Tuple[List[Segment], str, float]:
+        from faster_whisper.audio import decode_audio
+
+        start = timer()
+        samples = decode_audio(audio_file, sampling_rate=SAMPLE_RATE)
+        cuts = split_at_silences(samples, self.workers, self.min_silence_duration_ms)
+        cuts = [0] + cuts + [len(samples)]
+
+        pool = self._pool()
+        # detected once on the opening speech, like a single pass does, so
+        # every chunk is decoded in the same language
+        language, probability = pool.submit(
+            _worker_detect_language, samples[cuts[0] : cuts[1]]
+        ).result()
+        futures = [
+            pool.submit(_worker_transcribe, samples[a:b], a / SAMPLE_RATE, language)
+            for a, b in zip(cuts, cuts[1:])
+        ]
+        results = [f.result() for f in futures]
+
+        segments = [segment for chunk in results for segment in chunk]
+        logger.info(
+            f"transcribed {len(results)} chunks in parallel, elapsed: {timer() - start:.2f} s"
+        )
+        return segments, language, probability
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+parallel = ParallelTranscriber(
+    manager,
+    workers=int(config.whisper.get("parallel_workers", 0)),
+    min_duration=float(config.whisper.get("parallel_min_duration", 120)),
+)
+
+
+def _use_parallel(audio_file: str) -> bool:
+    return not config.whisper.get("batched", False) and parallel.enabled_for(
+        media_probe.audio_duration(audio_file)
+    )
+
+
+def _recognition_params(audio_file: str) -> dict:
+    """
+    Every setting that changes the recognized segments, part of the cache key
+    """
+    batched = bool(config.whisper.get("batched", False))
+    params = {
+        "model_size": manager.model_size,
+        "compute_type": manager.compute_type,
+        "batched": batched,
+        "vad": VAD_PARAMETERS,
+    }
+    if batched:
+        params["vad"] = {
+            "min_silence_duration_ms": batcher.min_silence_duration_ms,
+            "max_speech_duration_s": CHUNK_SECONDS,
+        }
+    else:
+        params["beam_size"] = 5
+    # the chunks of the parallel path have their own segment boundaries
+    if _use_parallel(audio_file):
+        params["parallel"] = {
+            "workers": parallel.workers,
+            "min_silence_duration_ms": parallel.min_silence_duration_ms,
+        }
+    return params
+
+
+def _segments_to_json(segments: List[Segment]) -> list:
+    return [
+        {
+            "start": s.start,
+            "end": s.end,
+            "text": s.text,
+            "words": [[w.start, w.end, w.word] for w in s.words],
+        }
+        for s in segments
+    ]
+
+
+def _segments_from_json(items: list) -> List[Segment]:
+    return [
+        Segment(
+            item["start"],
+            item["end"],
+            item["text"],
+            [Word(*w) for w in item.get("words", [])],
+        )
+        for item in items
+    ]
+
+
+def _load_cached(key: str):
+    data = transcript_cache.load(key)
+    if not data:
+        return None
+    return (
+        _segments_from_json(data.get("segments", [])),
+        data.get("language", ""),
+        data.get("language_probability", 0.0),
+    )
+
+
+def cached_transcript(audio_file: str):
+    """
+    Cached (segments, language, language_probability) of an audio file, or None.
+    Never runs the model.
+    """
+    if not config.whisper.get("cache", True) or not os.path.isfile(audio_file):
+        return None
+    return _load_cached(transcript_cache.cache_key(audio_file, **_recognition_params(audio_file)))
+
+
+def _recognize(audio_file: str) -> Tuple[List[Segment], str, float]:
+    if config.whisper.get("batched", False):
+        return batcher.transcribe(audio_file)
+    if _use_parallel(audio_file):
+        return parallel.transcribe(audio_file)
+
+    with manager.acquire() as model:
+        segments, info = model.transcribe(
+            audio_file,
+            beam_size=5,
+            word_timestamps=True,
+            vad_filter=True,
+            vad_parameters=VAD_PARAMETERS,
+        )
+        segments = [_to_segment(segment) for segment in segments]
+    return segments, info.language, info.language_probability
+
+
+def transcribe(audio_file: str) -> Tuple[List[Segment], str, float]:
+    """
+    Recognize an audio file, returns (segments, language, language_probability)
+    """
+    use_cache = config.whisper.get("cache", True)
+    if use_cache:
+        key = transcript_cache.cache_key(audio_file, **_recognition_params(audio_file))
+        cached = _load_cached(key)
+        if cached:
+            logger.info(f"transcript cache hit: {audio_file}")
+            return cached
+
+    segments, language, probability = _recognize(audio_file)
+    # an empty result may be a transient failure, it is not kept
+    if use_cache and segments:
+        transcript_cache.save(
+            key,
+            {
+                "language": language,
+                "language_probability": probability,
+                "segments": _segments_to_json(segments),
+            },
+        )
+    return segments, language, probability